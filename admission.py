@@ -0,0 +1,100 @@
+import time
+import posixpath
+import logging
+import threading
+
+logger = logging.getLogger("MT_Auto_Seed")
+
+def is_under_path(path, parent):
+    """按路径组成部分判断path是否位于parent目录下（/downloads2 不属于 /downloads）"""
+    path = posixpath.normpath(path)
+    parent = posixpath.normpath(parent)
+    return path == parent or path.startswith(parent.rstrip("/") + "/")
+
+class AdmissionController:
+    """添加种子前的磁盘容量准入控制
+
+    可用空间 = Transmission报告的save_path剩余空间
+             - 该目录下已添加但未下载完成的种子剩余大小
+             - 上次刷新后新添加和正在处理中的种子大小
+    可用空间减去新种子大小后低于预留空间时拒绝准入，并暂停后续下载。
+    """
+    def __init__(self, client_getter, save_path, reserve=0, refresh_interval=60):
+        self.client_getter = client_getter
+        self.save_path = save_path
+        self.reserve = reserve
+        self.refresh_interval = refresh_interval
+        self.free_space = None
+        self.queued_bytes = 0
+        self.added_bytes = 0
+        self.inflight_bytes = 0
+        self.last_refresh = 0
+        self.paused = False
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """从Transmission获取剩余空间和未完成种子的剩余大小"""
+        try:
+            client = self.client_getter()
+            free_space = client.free_space(self.save_path)
+            torrents = client.get_torrents(arguments=["id", "downloadDir", "leftUntilDone"])
+            queued_bytes = sum(
+                torrent.left_until_done for torrent in torrents
+                if is_under_path(torrent.download_dir, self.save_path)
+            )
+        except Exception as e:
+            logger.warning("获取Transmission剩余空间失败: %s", e)
+            # 沿用上次的数据，避免每个种子都重试
+            self.last_refresh = time.time()
+            return
+
+        with self._lock:
+            self.free_space = free_space
+            self.queued_bytes = queued_bytes
+            # 上次刷新后添加的种子已计入queued_bytes
+            self.added_bytes = 0
+            self.last_refresh = time.time()
+        if free_space is None:
+            logger.warning("Transmission未返回 %s 的剩余空间，跳过容量检查", self.save_path)
+        else:
+            logger.info("剩余空间 %.1f GiB，未完成种子待下载 %.1f GiB",
+                        free_space / 1024 ** 3, queued_bytes / 1024 ** 3)
+
+    def admit(self, size):
+        """为新种子预留空间，空间不足时返回False并暂停后续下载"""
+        if self.paused:
+            return False
+        if time.time() - self.last_refresh > self.refresh_interval:
+            self.refresh()
+
+        with self._lock:
+            if self.free_space is not None:
+                available = self.free_space - self.queued_bytes - self.added_bytes - self.inflight_bytes
+                if available - size < self.reserve:
+                    self.paused = True
+                    logger.warning("磁盘空间不足: 可用 %.1f GiB，种子需要 %.1f GiB，预留 %.1f GiB，暂停下载新种子",
+                                   available / 1024 ** 3, size / 1024 ** 3, self.reserve / 1024 ** 3)
+                    return False
+            self.inflight_bytes += size
+        return True
+
+    def resume(self):
+        """根据最近一次获取的剩余空间重新检查，可用空间高于预留空间时恢复准入，返回是否已恢复"""
+        with self._lock:
+            if self.free_space is None:
+                self.paused = False
+            else:
+                available = self.free_space - self.queued_bytes - self.added_bytes - self.inflight_bytes
+                self.paused = available <= self.reserve
+        return not self.paused
+
+    def commit(self, size):
+        """种子已添加到Transmission，预留空间转为已占用"""
+        with self._lock:
+            self.inflight_bytes -= size
+            self.added_bytes += size
+
+    def release(self, size):
+        """种子未添加（已存在或失败），释放预留空间"""
+        with self._lock:
+            self.inflight_bytes -= size
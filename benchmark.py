@@ -0,0 +1,93 @@
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+import tempfile
+import threading
+
+# 项目目录，子进程在临时目录中运行以确保不依赖本地config.yaml和state.json
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, PROJECT_DIR)
+
+# 启动耗时测试场景: (名称, 命令行参数)
+STARTUP_CASES = [
+    ("python 解释器启动", ["-c", "pass"]),
+    ("import main", ["-c", "import main"]),
+    ("main.py --help", [os.path.join(PROJECT_DIR, "main.py"), "--help"]),
+    ("main.py status", [os.path.join(PROJECT_DIR, "main.py"), "status"]),
+    ("导入全部重量级依赖(对照)", ["-c", "import requests, transmission_rpc, torrentool.api, yaml"]),
+]
+
+def measure_startup(args, repeat, work_dir):
+    """多次启动子进程，返回每次的耗时（毫秒）"""
+    env = dict(os.environ, PYTHONPATH=PROJECT_DIR)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + args, cwd=work_dir, env=env,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+def bench_startup(repeat):
+    """测量CLI启动耗时"""
+    print(f"=== 启动耗时 (重复 {repeat} 次, 单位ms) ===")
+    with tempfile.TemporaryDirectory() as work_dir:
+        for name, args in STARTUP_CASES:
+            timings = measure_startup(args, repeat, work_dir)
+            print(f"{name:<28} 中位数 {statistics.median(timings):8.1f}  最小 {min(timings):8.1f}")
+
+class LockedSet:
+    """单锁集合（对照组）"""
+    def __init__(self):
+        self._items = set()
+        self._lock = threading.Lock()
+
+    def add(self, item):
+        with self._lock:
+            self._items.add(item)
+
+    def __contains__(self, item):
+        with self._lock:
+            return item in self._items
+
+    def snapshot(self):
+        with self._lock:
+            return list(self._items)
+
+def run_set_workload(container, workers, operations):
+    """多个线程并发写入和查询，同时主线程不断生成快照，返回耗时（毫秒）"""
+    def worker(offset):
+        for i in range(operations):
+            item = str(offset * operations + i)
+            container.add(item)
+            item in container
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(workers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    while any(thread.is_alive() for thread in threads):
+        container.snapshot()
+    for thread in threads:
+        thread.join()
+    return (time.perf_counter() - start) * 1000
+
+def bench_concurrent_sets(workers=8, operations=20000):
+    """测量已处理ID集合在并发写入和快照下的耗时"""
+    from concurrent_sets import StripedSet
+    print(f"=== 并发集合 ({workers} 线程 x {operations} 次写入+查询, 单位ms) ===")
+    for name, factory in [("单锁set(对照)", LockedSet), ("StripedSet", StripedSet)]:
+        print(f"{name:<28} {run_set_workload(factory(), workers, operations):8.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="mt_auto_seed 性能基准测试")
+    parser.add_argument("--repeat", type=int, default=10, help="每个场景重复次数")
+    args = parser.parse_args()
+    bench_startup(args.repeat)
+    bench_concurrent_sets()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import threading
+
+class StripedSet:
+    """分段加锁的线程安全集合
+
+    元素按哈希值分布到多个分段，每个分段有独立的锁，
+    多个工作线程同时写入不同分段时不会互相等待。
+    """
+    def __init__(self, items=(), stripes=16):
+        self._stripes = [set() for _ in range(stripes)]
+        self._locks = [threading.Lock() for _ in range(stripes)]
+        for item in items:
+            self.add(item)
+
+    def _index(self, item):
+        return hash(item) % len(self._stripes)
+
+    def add(self, item):
+        """添加元素"""
+        index = self._index(item)
+        with self._locks[index]:
+            self._stripes[index].add(item)
+
+    def discard(self, item):
+        """移除元素（不存在时忽略）"""
+        index = self._index(item)
+        with self._locks[index]:
+            self._stripes[index].discard(item)
+
+    def __contains__(self, item):
+        index = self._index(item)
+        with self._locks[index]:
+            return item in self._stripes[index]
+
+    def __len__(self):
+        return sum(len(stripe) for stripe in self._stripes)
+
+    def __iter__(self):
+        return iter(self.snapshot())
+
+    def snapshot(self):
+        """返回当前元素的列表副本，用于持久化
+
+        逐个分段加锁复制，不会阻塞其他分段的写入，
+        复制期间并发写入的元素可能出现在本次或下一次快照中。
+        """
+        items = []
+        for lock, stripe in zip(self._locks, self._stripes):
+            with lock:
+                items.extend(stripe)
+        return items
+
+
+class CopyOnWriteSet:
+    """写时复制的线程安全集合
+
+    读取直接访问不可变的frozenset，无需加锁；写入时复制出新集合再替换引用。
+    适合读多写少的场景，例如Transmission种子哈希缓存。
+    """
+    def __init__(self, items=()):
+        self._items = frozenset(items)
+        self._lock = threading.Lock()
+
+    def add(self, item):
+        """添加元素，返回是否为新元素"""
+        with self._lock:
+            if item in self._items:
+                return False
+            self._items = self._items | {item}
+            return True
+
+    def discard(self, item):
+        """移除元素，返回元素是否存在"""
+        with self._lock:
+            if item not in self._items:
+                return False
+            self._items = self._items - {item}
+            return True
+
+    def replace(self, items):
+        """用新的元素整体替换集合内容"""
+        items = frozenset(items)
+        with self._lock:
+            self._items = items
+
+    def __contains__(self, item):
+        return item in self._items
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def snapshot(self):
+        """返回当前内容的不可变快照（无需复制）"""
+        return self._items
@@ -0,0 +1,255 @@
+import threading
+from exceptions import ConfigError
+
+# 默认配置文件路径
+DEFAULT_CONFIG_PATH = "config.yaml"
+
+# 必填配置项: (配置段, 配置键, 类型)
+REQUIRED_FIELDS = [
+    ("mt", "user_agent", str),
+    ("mt", "api_key", str),
+    ("mt", "teams", list),
+    ("mt", "categories", list),
+    ("transmission", "host", str),
+    ("transmission", "port", int),
+    ("transmission", "username", str),
+    ("transmission", "password", str),
+    ("transmission", "save_path", str),
+    ("transmission", "labels", list),
+    ("download", "dir", str),
+    ("download", "request_interval", (int, float)),
+    ("download", "max_download_count", int),
+    ("download", "page_size", int),
+    ("download", "max_retries", int),
+    ("download", "initial_retry_delay", (int, float)),
+    ("download", "max_workers", int),
+    ("download", "max_size", int),
+    ("download", "min_size", int),
+]
+
+# 可选配置项: (配置段, 配置键, 类型, 默认值)
+OPTIONAL_FIELDS = [
+    ("download", "free_space_reserve", int, 0),
+    ("download", "free_space_check_interval", (int, float), 60),
+    ("download", "max_query_workers", int, 4),
+    ("eviction", "max_count", int, 0),
+    ("eviction", "max_total_size", int, 0),
+    ("eviction", "policy", str, "score"),
+    ("eviction", "batch_size", int, 10),
+    ("eviction", "delete_data", bool, True),
+    ("eviction", "min_seed_days", (int, float), 7),
+    ("eviction", "refresh_interval", (int, float), 600),
+]
+
+# 做种池淘汰策略
+EVICTION_POLICIES = ("score", "lru")
+
+# 日志级别和输出格式
+LOG_LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL")
+LOG_FORMATS = ("text", "json")
+
+# logging段的数值配置项: (配置键, 类型)，rate_limit子段单独校验
+LOGGING_NUMERIC_FIELDS = [("queue_size", int)]
+RATE_LIMIT_FIELDS = [("interval", (int, float)), ("max_repeats", int)]
+
+def coerce_value(value, expected_type):
+    """把配置值转换为期望的类型（如字符串形式的端口和大小、纯数字的密码），无法转换时抛出ValueError"""
+    expected_types = expected_type if isinstance(expected_type, tuple) else (expected_type,)
+    if isinstance(value, bool) or bool in expected_types:
+        if isinstance(value, bool) and bool in expected_types:
+            return value
+        raise ValueError(value)
+    if isinstance(value, expected_types):
+        return value
+    if str in expected_types and isinstance(value, (int, float)):
+        return str(value)
+    if int in expected_types:
+        if isinstance(value, str):
+            try:
+                return int(value.strip())
+            except ValueError:
+                if float not in expected_types:
+                    raise
+        elif isinstance(value, float) and value.is_integer():
+            return int(value)
+    if float in expected_types and isinstance(value, str):
+        return float(value.strip())
+    raise ValueError(value)
+
+_config = None
+_config_path = DEFAULT_CONFIG_PATH
+_config_lock = threading.Lock()
+
+def load_config(config_path=DEFAULT_CONFIG_PATH):
+    """加载配置文件"""
+    import yaml
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            return yaml.safe_load(f)
+    except FileNotFoundError:
+        raise ConfigError(f"配置文件不存在: {config_path}")
+    except yaml.YAMLError as e:
+        raise ConfigError(f"配置文件格式错误: {str(e)}")
+
+class Config:
+    """经过校验的运行配置"""
+    def __init__(self, data):
+        self.raw = data or {}
+        self.validate()
+
+        mt = self.raw['mt']
+        self.mt_user_agent = mt['user_agent']
+        self.mt_api_key = mt['api_key']
+        self.teams = mt['teams']
+        self.categories = mt['categories']
+
+        transmission = self.raw['transmission']
+        self.tr_host = transmission['host']
+        self.tr_port = transmission['port']
+        self.tr_user = transmission['username']
+        self.tr_password = transmission['password']
+        self.save_path = transmission['save_path']
+        self.labels = transmission['labels']
+
+        download = self.raw['download']
+        self.download_dir = download['dir']
+        self.request_interval = download['request_interval']
+        self.max_download_count = download['max_download_count']
+        self.page_size = download['page_size']
+        self.max_retries = download['max_retries']
+        self.initial_retry_delay = download['initial_retry_delay']
+        self.max_workers = download['max_workers']
+        self.max_size = download['max_size']
+        self.min_size = download['min_size']
+        self.free_space_reserve = self.optional('download', 'free_space_reserve')
+        self.free_space_check_interval = self.optional('download', 'free_space_check_interval')
+        self.max_query_workers = self.optional('download', 'max_query_workers')
+
+        self.eviction_max_count = self.optional('eviction', 'max_count')
+        self.eviction_max_total_size = self.optional('eviction', 'max_total_size')
+        self.eviction_policy = self.optional('eviction', 'policy')
+        self.eviction_batch_size = self.optional('eviction', 'batch_size')
+        self.eviction_delete_data = self.optional('eviction', 'delete_data')
+        self.eviction_min_seed_days = self.optional('eviction', 'min_seed_days')
+        self.eviction_refresh_interval = self.optional('eviction', 'refresh_interval')
+
+        self.logging = self.raw.get('logging') or {}
+
+    def optional(self, section, key):
+        """读取可选配置项，未配置时返回默认值"""
+        value = (self.raw.get(section) or {}).get(key)
+        if value is None:
+            for field_section, field_key, _, default in OPTIONAL_FIELDS:
+                if (field_section, field_key) == (section, key):
+                    return default
+        return value
+
+    def validate(self):
+        """校验必填配置项和取值范围，有问题时抛出ConfigError"""
+        if not isinstance(self.raw, dict):
+            raise ConfigError("配置文件内容必须是字典")
+        # 复制各配置段，转换类型时不修改调用方传入的数据
+        self.raw = {name: dict(value) if isinstance(value, dict) else value for name, value in self.raw.items()}
+        errors = []
+        for section, key, expected_type in REQUIRED_FIELDS:
+            value = (self.raw.get(section) or {}).get(key)
+            if value is None:
+                errors.append(f"缺少配置项 {section}.{key}")
+                continue
+            try:
+                self.raw[section][key] = coerce_value(value, expected_type)
+            except ValueError:
+                errors.append(f"配置项 {section}.{key} 类型错误: {value!r}")
+        for section, key, expected_type, _ in OPTIONAL_FIELDS:
+            value = (self.raw.get(section) or {}).get(key)
+            if value is None:
+                continue
+            try:
+                value = self.raw[section][key] = coerce_value(value, expected_type)
+            except ValueError:
+                errors.append(f"配置项 {section}.{key} 类型错误: {value!r}")
+                continue
+            if isinstance(value, (int, float)) and not isinstance(value, bool) and value < 0:
+                errors.append(f"配置项 {section}.{key} 不能为负数: {value!r}")
+        if not errors:
+            download = self.raw['download']
+            if download['max_workers'] < 1:
+                errors.append("配置项 download.max_workers 必须大于0")
+            if download['page_size'] < 1:
+                errors.append("配置项 download.page_size 必须大于0")
+            if download['min_size'] > download['max_size']:
+                errors.append("配置项 download.min_size 不能大于 download.max_size")
+            if self.optional('eviction', 'policy') not in EVICTION_POLICIES:
+                errors.append(f"配置项 eviction.policy 必须是 {'/'.join(EVICTION_POLICIES)} 之一")
+            if self.optional('download', 'max_query_workers') < 1:
+                errors.append("配置项 download.max_query_workers 必须大于0")
+            if self.optional('eviction', 'batch_size') < 1:
+                errors.append("配置项 eviction.batch_size 必须大于0")
+        errors.extend(self.validate_logging())
+        if errors:
+            raise ConfigError("配置校验失败: " + "; ".join(errors))
+
+    def validate_logging(self):
+        """校验并规范化logging配置段，返回错误列表"""
+        log_config = self.raw.get('logging')
+        if log_config is None:
+            return []
+        if not isinstance(log_config, dict):
+            return [f"配置项 logging 必须是字典: {log_config!r}"]
+        errors = []
+        level = log_config.get('level')
+        if level is not None:
+            if isinstance(level, str) and level.strip().upper() in LOG_LEVELS:
+                log_config['level'] = level.strip().upper()
+            else:
+                errors.append(f"配置项 logging.level 必须是 {'/'.join(LOG_LEVELS)} 之一: {level!r}")
+        log_format = log_config.get('format')
+        if log_format is not None and log_format not in LOG_FORMATS:
+            errors.append(f"配置项 logging.format 必须是 {'/'.join(LOG_FORMATS)} 之一: {log_format!r}")
+        log_file = log_config.get('file')
+        if log_file is not None and not isinstance(log_file, str):
+            errors.append(f"配置项 logging.file 类型错误: {log_file!r}")
+
+        rate_limit = log_config.get('rate_limit')
+        if rate_limit is not None and not isinstance(rate_limit, dict):
+            errors.append(f"配置项 logging.rate_limit 必须是字典: {rate_limit!r}")
+            rate_limit = None
+        elif rate_limit is not None:
+            rate_limit = log_config['rate_limit'] = dict(rate_limit)
+        fields = [(log_config, "logging", key, expected_type) for key, expected_type in LOGGING_NUMERIC_FIELDS]
+        if rate_limit:
+            fields += [(rate_limit, "logging.rate_limit", key, expected_type) for key, expected_type in RATE_LIMIT_FIELDS]
+        for data, prefix, key, expected_type in fields:
+            value = data.get(key)
+            if value is None:
+                continue
+            try:
+                value = data[key] = coerce_value(value, expected_type)
+            except ValueError:
+                errors.append(f"配置项 {prefix}.{key} 类型错误: {value!r}")
+                continue
+            if value < 0:
+                errors.append(f"配置项 {prefix}.{key} 不能为负数: {value!r}")
+        return errors
+
+def set_config_path(config_path):
+    """设置配置文件路径，下次获取配置时重新加载"""
+    global _config, _config_path
+    with _config_lock:
+        _config_path = config_path
+        _config = None
+
+def set_config(config):
+    """直接设置当前配置（主要用于测试和工具脚本），传入None则重置为延迟加载"""
+    global _config
+    with _config_lock:
+        _config = config
+
+def get_config():
+    """获取当前配置，首次调用时才读取并校验配置文件"""
+    global _config
+    if _config is None:
+        with _config_lock:
+            if _config is None:
+                _config = Config(load_config(_config_path))
+    return _config
@@ -0,0 +1,136 @@
+import math
+import time
+import logging
+
+logger = logging.getLogger("MT_Auto_Seed")
+
+# 构建统计索引需要从Transmission获取的字段
+STATS_FIELDS = ["id", "hashString", "name", "labels", "uploadRatio", "activityDate",
+                "addedDate", "totalSize", "percentDone", "trackerStats"]
+
+class TorrentStats:
+    """单个种子的做种统计"""
+    def __init__(self, torrent):
+        self.id = torrent.id
+        self.hash = torrent.hashString.lower()
+        self.name = torrent.name
+        self.ratio = max(torrent.ratio, 0)
+        self.size = torrent.total_size
+        self.complete = torrent.percent_done >= 1
+        self.added = torrent.added_date.timestamp()
+        self.last_activity = torrent.activity_date.timestamp()
+        self.seeders = max([tracker.seeder_count for tracker in torrent.tracker_stats] + [0])
+
+    def score(self, now):
+        """做种价值：分享率越高、做种人数越少、最近越活跃，价值越高"""
+        idle_days = max(now - self.last_activity, 0) / 86400
+        return (1 + self.ratio) / ((1 + math.log1p(self.seeders)) * (1 + idle_days))
+
+class TorrentStatsIndex:
+    """带有指定标签的种子统计索引
+
+    两次重建之间新添加的种子没有统计数据，只计入数量和体积，不参与淘汰。
+    """
+    def __init__(self, labels):
+        self.labels = set(labels)
+        self.stats = {}
+        self.pending_count = 0
+        self.pending_size = 0
+        self.last_refresh = 0
+
+    def refresh(self, client):
+        """从Transmission重建索引，只保留带有本工具标签的种子"""
+        torrents = client.get_torrents(arguments=STATS_FIELDS)
+        self.stats = {
+            stats.hash: stats for stats in
+            (TorrentStats(torrent) for torrent in torrents if self.labels & set(torrent.labels))
+        }
+        self.pending_count = 0
+        self.pending_size = 0
+        self.last_refresh = time.time()
+
+    def add_pending(self, size):
+        """记录上次重建后新添加的种子"""
+        self.pending_count += 1
+        self.pending_size += size
+
+    def remove(self, torrent_hash):
+        """从索引中移除种子"""
+        self.stats.pop(torrent_hash, None)
+
+    def total_size(self):
+        return sum(stats.size for stats in self.stats.values()) + self.pending_size
+
+    def __len__(self):
+        return len(self.stats) + self.pending_count
+
+class SeedingPoolEvictor:
+    """做种池淘汰：超过数量或体积上限时，分批删除价值最低的种子"""
+    def __init__(self, client_getter, labels, max_count=0, max_total_size=0, policy="score",
+                 batch_size=10, delete_data=True, min_seed_days=7, refresh_interval=600):
+        self.client_getter = client_getter
+        self.index = TorrentStatsIndex(labels)
+        self.max_count = max_count
+        self.max_total_size = max_total_size
+        self.policy = policy
+        self.batch_size = batch_size
+        self.delete_data = delete_data
+        self.min_seed_days = min_seed_days
+        self.refresh_interval = refresh_interval
+
+    @property
+    def enabled(self):
+        return bool(self.max_count or self.max_total_size)
+
+    def note_added(self, size):
+        """记录新添加到Transmission的种子，使两次重建索引之间的预算检查保持准确"""
+        self.index.add_pending(size)
+
+    def select_victims(self, now=None):
+        """按淘汰策略选出需要删除的种子，直到满足数量和体积上限"""
+        now = now or time.time()
+        count = len(self.index)
+        total_size = self.index.total_size()
+        min_added = now - self.min_seed_days * 86400
+        # 未下载完成或做种时间不足的种子不参与淘汰
+        candidates = [stats for stats in self.index.stats.values() if stats.complete and stats.added <= min_added]
+        if self.policy == "lru":
+            candidates.sort(key=lambda stats: stats.last_activity)
+        else:
+            candidates.sort(key=lambda stats: stats.score(now))
+
+        victims = []
+        for stats in candidates:
+            over_count = self.max_count and count > self.max_count
+            over_size = self.max_total_size and total_size > self.max_total_size
+            if not (over_count or over_size):
+                break
+            victims.append(stats)
+            count -= 1
+            total_size -= stats.size
+        return victims
+
+    def evict(self, state_manager):
+        """检查预算并分批淘汰种子，返回被删除种子的哈希列表"""
+        if not self.enabled:
+            return []
+        client = self.client_getter()
+        # 完整的统计需要获取所有种子的trackerStats，只按间隔重建，期间根据添加和淘汰的种子更新索引
+        if time.time() - self.index.last_refresh > self.refresh_interval:
+            self.index.refresh(client)
+        victims = self.select_victims()
+
+        evicted = []
+        for start in range(0, len(victims), self.batch_size):
+            batch = victims[start:start + self.batch_size]
+            client.remove_torrent([stats.id for stats in batch], delete_data=self.delete_data)
+            for stats in batch:
+                self.index.remove(stats.hash)
+                state_manager.add_evicted_torrent(stats.hash)
+                evicted.append(stats.hash)
+                logger.info("已淘汰种子: %s (分享率 %.2f, 做种人数 %s, 大小 %.1f GiB)",
+                            stats.name, stats.ratio, stats.seeders, stats.size / 1024 ** 3)
+        if evicted:
+            logger.info("共淘汰 %s 个种子，做种池剩余 %s 个，共 %.1f GiB",
+                        len(evicted), len(self.index), self.index.total_size() / 1024 ** 3)
+        return evicted
@@ -0,0 +1,157 @@
+import json
+import time
+import queue
+import logging
+import threading
+import logging.handlers
+
+logger = logging.getLogger("MT_Auto_Seed")
+
+# 默认日志配置（对应config.yaml中的logging部分）
+DEFAULT_LOGGING_CONFIG = {
+    "level": "INFO",
+    "file": "mt_auto_seed.log",
+    "format": "text",
+    "queue_size": 0,
+    "rate_limit": {
+        "interval": 60,
+        "max_repeats": 20
+    }
+}
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """JSON Lines格式化器，每条日志输出为一行JSON"""
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage()
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class RateLimitFilter(logging.Filter):
+    """限制重复日志的频率：内容相同的日志在一个时间窗口内最多输出max_repeats次
+
+    WARNING及以上级别的日志不限流。
+    """
+    # 窗口记录超过此数量时清理已过期的记录
+    MAX_WINDOWS = 1000
+
+    def __init__(self, interval=60, max_repeats=20):
+        super().__init__()
+        self.interval = interval
+        self.max_repeats = max_repeats
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        try:
+            # 在调用线程中只计算参数的哈希，不格式化日志内容
+            message_hash = hash((record.msg, record.args))
+        except TypeError:
+            # 参数不可哈希时无法判断内容是否相同，不限流
+            return True
+        key = (record.name, record.levelno, record.pathname, record.lineno, message_hash)
+        now = time.monotonic()
+        with self._lock:
+            if len(self._windows) > self.MAX_WINDOWS:
+                self._prune(now)
+            started, count, suppressed = self._windows.get(key, (now, 0, 0))
+            if now - started >= self.interval:
+                started, count = now, 0
+                if suppressed:
+                    # 新窗口的第一条日志附带上一窗口被抑制的数量
+                    record.msg = f"{record.msg} (过去 {self.interval} 秒内已抑制 {suppressed} 条重复日志)"
+                    suppressed = 0
+            if count >= self.max_repeats:
+                self._windows[key] = (started, count, suppressed + 1)
+                return False
+            self._windows[key] = (started, count + 1, suppressed)
+        return True
+
+    def _prune(self, now):
+        """清理已过期且没有被抑制日志的窗口记录"""
+        for key, (started, _, suppressed) in list(self._windows.items()):
+            if now - started >= self.interval and not suppressed:
+                del self._windows[key]
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """不阻塞调用线程的队列处理器，日志格式化和写入都在后台线程完成"""
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # 同进程内的队列无需序列化，保留原始record以便在后台线程延迟格式化
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # 队列已满时丢弃日志，不阻塞工作线程
+            self.dropped += 1
+
+
+def setup_logging(log_config=None):
+    """根据配置初始化异步日志，返回需要在程序结束时停止的QueueListener"""
+    options = dict(DEFAULT_LOGGING_CONFIG)
+    options.update(log_config or {})
+    rate_limit = dict(DEFAULT_LOGGING_CONFIG["rate_limit"])
+    rate_limit.update(options.get("rate_limit") or {})
+
+    if options["format"] == "json":
+        formatter = JsonLinesFormatter()
+    else:
+        formatter = logging.Formatter(TEXT_FORMAT)
+
+    handlers = [logging.StreamHandler()]
+    if options["file"]:
+        handlers.append(logging.FileHandler(options["file"], encoding='utf-8'))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.Queue(maxsize=options["queue_size"])
+    queue_handler = NonBlockingQueueHandler(log_queue)
+    if rate_limit["max_repeats"]:
+        queue_handler.addFilter(RateLimitFilter(rate_limit["interval"], rate_limit["max_repeats"]))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    # 在logger上设置级别，使低于级别的日志在调用处直接跳过，不做任何格式化
+    level = str(options["level"]).upper()
+    root.setLevel(level)
+    logger.setLevel(level)
+
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
+
+
+def shutdown_logging(listener):
+    """停止后台日志线程并写出队列中剩余的日志"""
+    if listener is None:
+        return
+    root = logging.getLogger()
+    queue_handlers = [h for h in root.handlers if isinstance(h, NonBlockingQueueHandler)]
+    for handler in queue_handlers:
+        if handler.dropped:
+            logger.warning("日志队列已满，丢弃了 %s 条日志", handler.dropped)
+    listener.stop()
+    for handler in queue_handlers:
+        root.removeHandler(handler)
+    for handler in listener.handlers:
+        handler.close()
@@ -1,93 +1,86 @@
 import os
 import sys
 import time
-import yaml
 import logging
-import requests
-import transmission_rpc
+import argparse
+import threading
 import concurrent.futures
-from torrentool.api import Torrent
+# requests、transmission_rpc和torrentool在用到时才导入，以加快启动速度
+from config import get_config, set_config_path
 from exceptions import ConfigError, APIError, DownloadError, TransmissionError, HashError
 from state_manager import StateManager
+from concurrent_sets import CopyOnWriteSet
+from admission import AdmissionController
+from eviction import SeedingPoolEvictor
+from query_fanout import QueryFanOut, build_query_streams
 
-# 配置日志系统
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("mt_auto_seed.log"),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger("MT_Auto_Seed")
 
-# 读取配置文件
-def load_config(config_path="config.yaml"):
-    """加载配置文件"""
-    try:
-        with open(config_path, 'r', encoding='utf-8') as f:
-            return yaml.safe_load(f)
-    except FileNotFoundError:
-        raise ConfigError(f"配置文件不存在: {config_path}")
-    except yaml.YAMLError as e:
-        raise ConfigError(f"配置文件格式错误: {str(e)}")
-
-# 加载配置
-CONFIG = load_config()
-
 # 全局Transmission客户端实例
 TR_CLIENT = None
 
-# 从配置中提取参数
-MT_USER_AGENT = CONFIG['mt']['user_agent']
-MT_API_KEY = CONFIG['mt']['api_key']
-TEAMS = CONFIG['mt']['teams']
-CATEGORIES = CONFIG['mt']['categories']
-
-TR_HOST = CONFIG['transmission']['host']
-TR_PORT = CONFIG['transmission']['port']
-TR_USER = CONFIG['transmission']['username']
-TR_PASSWORD = CONFIG['transmission']['password']
-SAVE_PATH = CONFIG['transmission']['save_path']
-LABELS = CONFIG['transmission']['labels']
-
-DOWNLOAD_DIR = CONFIG['download']['dir']
-REQUEST_INTERVAL = CONFIG['download']['request_interval']
-MAX_DOWNLOAD_COUNT = CONFIG['download']['max_download_count']
-PAGE_SIZE = CONFIG['download']['page_size']
-MAX_RETRIES = CONFIG['download']['max_retries']
-INITIAL_RETRY_DELAY = CONFIG['download']['initial_retry_delay']
-MAX_WORKERS = CONFIG['download']['max_workers']
-MAX_SIZE = CONFIG['download']['max_size']
-MIN_SIZE = CONFIG['download']['min_size']
-
-def get_mteam_torrents(page_number=1):
+# 强制退出前需要执行的清理函数（如写出性能分析结果），按注册的相反顺序执行
+EXIT_HOOKS = []
+EXIT_LOCK = threading.Lock()
+
+def force_exit(code):
+    """执行清理函数后强制终止进程，确保在多线程环境中能够退出"""
+    # 多个工作线程同时触发时只由第一个执行清理，其余等待进程终止
+    EXIT_LOCK.acquire()
+    for hook in reversed(EXIT_HOOKS):
+        try:
+            hook()
+        except Exception as e:
+            logger.error("退出前清理失败: %s", e)
+    os._exit(code)
+
+def get_mteam_torrents(page_number=1, teams=None, categories=None):
     """获取馒头官种列表（通过API接口）"""
+    return search_mteam_torrents(page_number, teams, categories)[0]
+
+def search_mteam_torrents(page_number=1, teams=None, categories=None):
+    """搜索一页官种，返回 (匹配的种子列表, 本页原始条目数)，未指定制作组和分类时使用配置"""
+    import requests
+    config = get_config()
     url = "https://api2.m-team.cc/api/torrent/search"
     headers = {
         "Content-Type": "application/json",
-        "x-api-key": MT_API_KEY,
-        "User-Agent": MT_USER_AGENT
+        "x-api-key": config.mt_api_key,
+        "User-Agent": config.mt_user_agent
     }
     
     # 请求体
     payload = {
         "mode": "normal",
         "visible": 1,
-        "categories": CATEGORIES,
-        "teams": TEAMS,
+        "categories": config.categories if categories is None else categories,
+        "teams": config.teams if teams is None else teams,
         "sortDirection": "ASC",
         "sortField": "SIZE",
         "pageNumber": page_number,
-        "pageSize": PAGE_SIZE
+        "pageSize": config.page_size
     }
     
     try:
-        logger.info(f"正在请求第 {page_number} 页种子列表")
-        response = requests.post(url, headers=headers, json=payload, timeout=30)
-        response.raise_for_status()
-        
-        data = response.json()
+        logger.info("正在请求第 %s 页种子列表", page_number)
+        # 处理请求过于频繁的情况
+        retry_count = 0
+        while True:
+            response = requests.post(url, headers=headers, json=payload, timeout=30)
+            if not response.ok and "請求過於頻繁" in response.text:
+                rate_limited = True
+            else:
+                response.raise_for_status()
+                data = response.json()
+                rate_limited = data.get("code") != "0" and "請求過於頻繁" in str(data.get("message", ""))
+            if not rate_limited:
+                break
+            if retry_count >= config.max_retries:
+                raise APIError(f"请求过于频繁，达到最大重试次数 {config.max_retries}")
+            delay = config.initial_retry_delay * (2 ** retry_count)
+            logger.warning("搜索请求过于频繁，%s秒后重试... (重试次数: %s/%s)", delay, retry_count+1, config.max_retries)
+            time.sleep(delay)
+            retry_count += 1
         
         # 检查响应是否成功
         if data.get("code") != "0":
@@ -96,25 +89,27 @@ def get_mteam_torrents(page_number=1):
             raise APIError(error_msg)
         
         torrents = []
+        items = data.get("data", {}).get("data", [])
         # 提取种子信息
-        for item in data.get("data", {}).get("data", []):
+        for item in items:
             id = item.get("id")
             title = item.get("name")
             size = item.get("size")
             seeders = item.get("status").get("seeders")
-            if int(size) < int(MIN_SIZE) or int(size) > int(MAX_SIZE):
-                logger.debug(f"种子 {title} 大小 {size} 不在指定范围内，跳过")
+            if int(size) < int(config.min_size) or int(size) > int(config.max_size):
+                logger.debug("种子 %s 大小 %s 不在指定范围内，跳过", title, size)
                 continue
             if int(seeders) < 10:
-                logger.debug(f"种子 {title} 做种数 {seeders} 不足，跳过")
+                logger.debug("种子 %s 做种数 %s 不足，跳过", title, seeders)
                 continue
             torrents.append({
                 "id": id,
-                "title": title
+                "title": title,
+                "size": int(size)
             })
         
-        logger.info(f"通过API获取到 {len(torrents)} 个匹配的种子")
-        return torrents
+        logger.info("通过API获取到 %s 个匹配的种子", len(torrents))
+        return torrents, len(items)
     
     except requests.exceptions.RequestException as e:
         error_msg = f"网络请求错误: {str(e)}"
@@ -129,28 +124,34 @@ def get_mteam_torrents(page_number=1):
         logger.error(error_msg)
         raise APIError(error_msg)
 
+def fetch_query_page(stream, page_number):
+    """获取单个查询流的一页种子"""
+    return search_mteam_torrents(page_number, stream.teams, stream.categories)
+
 def download_torrent(torrent_id, state_manager):
     """下载种子文件（通过API接口）"""
+    import requests
+    config = get_config()
     # 生成固定格式的文件名
     filename = f"mteam.{torrent_id}.torrent"
-    filepath = os.path.join(DOWNLOAD_DIR, filename)
+    filepath = os.path.join(config.download_dir, filename)
     
     # 检查文件是否已存在
     if os.path.exists(filepath):
-        logger.info(f"种子文件已存在，跳过下载: {filename}")
+        logger.info("种子文件已存在，跳过下载: %s", filename)
         return filepath
     
     # 生成下载token的API
     token_url = f"https://api2.m-team.cc/api/torrent/genDlToken?id={torrent_id}"
     headers = {
-        "x-api-key": MT_API_KEY,
-        "User-Agent": MT_USER_AGENT
+        "x-api-key": config.mt_api_key,
+        "User-Agent": config.mt_user_agent
     }
     
     # 请求下载token，处理请求过于频繁的情况
-    logger.info(f"正在请求种子 {torrent_id} 的下载token")
+    logger.info("正在请求种子 %s 的下载token", torrent_id)
     retry_count = 0
-    while retry_count < MAX_RETRIES:
+    while retry_count < config.max_retries:
         try:
             token_response = requests.post(token_url, headers=headers, timeout=30)
             token_response.raise_for_status()
@@ -161,8 +162,8 @@ def download_torrent(torrent_id, state_manager):
             if token_data.get("code") != "0":
                 error_msg = token_data.get('message', '未知错误')
                 if "請求過於頻繁" in error_msg:
-                    delay = INITIAL_RETRY_DELAY * (2 ** retry_count)
-                    logger.warning(f"获取token请求过于频繁，{delay}秒后重试... (重试次数: {retry_count+1}/{MAX_RETRIES})")
+                    delay = config.initial_retry_delay * (2 ** retry_count)
+                    logger.warning("获取token请求过于频繁，%s秒后重试... (重试次数: %s/%s)", delay, retry_count+1, config.max_retries)
                     time.sleep(delay)
                     retry_count += 1
                     continue
@@ -174,13 +175,13 @@ def download_torrent(torrent_id, state_manager):
             break  # 成功获取token，退出循环
         except requests.exceptions.RequestException as e:
             # 处理网络异常
-            delay = INITIAL_RETRY_DELAY * (2 ** retry_count)
-            logger.warning(f"获取token请求失败: {str(e)}，{delay}秒后重试... (重试次数: {retry_count+1}/{MAX_RETRIES})")
+            delay = config.initial_retry_delay * (2 ** retry_count)
+            logger.warning("获取token请求失败: %s，%s秒后重试... (重试次数: %s/%s)", e, delay, retry_count+1, config.max_retries)
             time.sleep(delay)
             retry_count += 1
     else:
         # 达到最大重试次数
-        error_msg = f"获取下载token失败: 达到最大重试次数 {MAX_RETRIES}"
+        error_msg = f"获取下载token失败: 达到最大重试次数 {config.max_retries}"
         logger.error(error_msg)
         raise APIError(error_msg)
     
@@ -192,11 +193,11 @@ def download_torrent(torrent_id, state_manager):
         raise APIError(error_msg)
     try:  
         # 下载种子文件，处理请求过于频繁的情况
-        logger.info(f"正在下载种子文件: {filename}")
+        logger.info("正在下载种子文件: %s", filename)
         retry_count = 0
-        while retry_count < MAX_RETRIES:
+        while retry_count < config.max_retries:
             try:
-                response = requests.get(download_url, headers={"User-Agent": MT_USER_AGENT}, timeout=30)
+                response = requests.get(download_url, headers={"User-Agent": config.mt_user_agent}, timeout=30)
                 response.raise_for_status()
                 
                 # 检查是否是请求过于频繁的错误
@@ -205,14 +206,13 @@ def download_torrent(torrent_id, state_manager):
                     if json_response.get("code") == 1:
                         message = json_response.get("message", "")
                         if "今日下載配額用盡" in message:
-                            logger.error(f"下载配额已用尽: {message}")
+                            logger.error("下载配额已用尽: %s", message)
                             state_manager.save_state()
                             logger.info("程序结束")
-                            # 使用os._exit()强制终止进程，确保在多线程环境中能够退出
-                            os._exit(1)
+                            force_exit(1)
                         elif "請求過於頻繁" in message:
-                            delay = INITIAL_RETRY_DELAY * (2 ** retry_count)
-                            logger.warning(f"请求过于频繁，{delay}秒后重试... (重试次数: {retry_count+1}/{MAX_RETRIES})\n")
+                            delay = config.initial_retry_delay * (2 ** retry_count)
+                            logger.warning("请求过于频繁，%s秒后重试... (重试次数: %s/%s)\n", delay, retry_count+1, config.max_retries)
                             time.sleep(delay)
                             retry_count += 1
                             continue
@@ -223,30 +223,29 @@ def download_torrent(torrent_id, state_manager):
                 # 下载成功，跳出循环
                 break
             except requests.exceptions.HTTPError as e:
-                logger.error(f"HTTP错误: {str(e)}")
+                logger.error("HTTP错误: %s", e)
                 # 检查响应内容是否包含下载配额用尽或请求过于频繁的信息
                 response_text = response.text
                 if "今日下載配額用盡" in response_text:
-                    logger.error(f"下载配额已用尽: {response_text}")
+                    logger.error("下载配额已用尽: %s", response_text)
                     logger.info("保存最终状态...")
                     state_manager.save_state()
                     logger.info("程序结束")
-                    # 使用os._exit()强制终止进程，确保在多线程环境中能够退出
-                    os._exit(1)
+                    force_exit(1)
                 elif "請求過於頻繁" in response_text:
-                    delay = INITIAL_RETRY_DELAY * (2 ** retry_count)
-                    logger.warning(f"请求过于频繁，{delay}秒后重试... (重试次数: {retry_count+1}/{MAX_RETRIES})\n")
+                    delay = config.initial_retry_delay * (2 ** retry_count)
+                    logger.warning("请求过于频繁，%s秒后重试... (重试次数: %s/%s)\n", delay, retry_count+1, config.max_retries)
                     time.sleep(delay)
                     retry_count += 1
                 else:
                     # 其他HTTP错误，直接抛出
                     raise DownloadError(f"HTTP错误: {str(e)}")
             except Exception as e:
-                logger.error(f"下载错误: {str(e)}")
+                logger.error("下载错误: %s", e)
                 raise DownloadError(f"下载错误: {str(e)}")
         else:
             # 达到最大重试次数仍然失败
-            error_msg = f"达到最大重试次数({MAX_RETRIES})，下载失败"
+            error_msg = f"达到最大重试次数({config.max_retries})，下载失败"
             logger.error(error_msg)
             raise DownloadError(error_msg)
         
@@ -254,51 +253,62 @@ def download_torrent(torrent_id, state_manager):
         with open(filepath, 'wb') as f:
             f.write(response.content)
         
-        logger.info(f"已下载: {filename}")
+        logger.info("已下载: %s", filename)
         return filepath
     
     except Exception as e:
-        logger.error(f"下载种子失败(ID: {torrent_id}): {str(e)}")
+        logger.error("下载种子失败(ID: %s): %s", torrent_id, e)
         return None
 
 def get_torrent_hash(torrent_file):
     """计算种子文件的info hash"""
     try:
         # 使用torrentool获取种子hash
+        from torrentool.api import Torrent
         torrent = Torrent.from_file(torrent_file)
         return torrent.info_hash
     except Exception as e:
-        logger.error(f"计算种子哈希失败: {str(e)}")
+        logger.error("计算种子哈希失败: %s", e)
         raise HashError(f"计算种子哈希失败: {str(e)}")
 
 def init_transmission_client():
     """初始化Transmission客户端连接"""
-    global TR_CLIENT, TRANSMISSION_HASH_CACHE, LAST_CACHE_UPDATE
+    global TR_CLIENT
     if TR_CLIENT is None:
+        config = get_config()
         try:
-            logger.info(f"尝试连接到Transmission: {TR_HOST}:{TR_PORT}")
+            import transmission_rpc
+            logger.info("尝试连接到Transmission: %s:%s", config.tr_host, config.tr_port)
             TR_CLIENT = transmission_rpc.Client(
-                host=TR_HOST,
-                port=TR_PORT,
-                username=TR_USER,
-                password=TR_PASSWORD
+                host=config.tr_host,
+                port=config.tr_port,
+                username=config.tr_user,
+                password=config.tr_password
             )
             logger.info("成功连接到Transmission")
             return True
         except Exception as e:
-            logger.error(f"连接Transmission失败: {str(e)}")
+            logger.error("连接Transmission失败: %s", e)
             raise TransmissionError(f"连接Transmission失败: {str(e)}")
     return True
 
-# 添加全局变量用于缓存种子哈希值
-TRANSMISSION_HASH_CACHE = set()
+def get_transmission_client():
+    """获取已初始化的Transmission客户端"""
+    if not TR_CLIENT:
+        init_transmission_client()
+    return TR_CLIENT
+
+# 添加全局变量用于缓存种子哈希值（工作线程并发读取，写时复制）
+TRANSMISSION_HASH_CACHE = CopyOnWriteSet()
 CACHE_EXPIRY_TIME = 300  # 缓存过期时间（秒）
 LAST_CACHE_UPDATE = 0
+# 缓存过期时只允许一个线程刷新
+CACHE_UPDATE_LOCK = threading.Lock()
 
 
 def update_transmission_cache():
-    """更新Transmission种子哈希缓存"""
-    global TR_CLIENT, TRANSMISSION_HASH_CACHE, LAST_CACHE_UPDATE
+    """更新Transmission种子哈希缓存，返回是否更新成功"""
+    global LAST_CACHE_UPDATE
     try:
         # 确保客户端已初始化
         if not TR_CLIENT:
@@ -306,16 +316,18 @@ def update_transmission_cache():
 
         logger.info("更新Transmission种子哈希缓存...")
         # 获取所有种子，然后提取哈希值
-        torrent_hashes = {torrent.hashString.lower() for torrent in TR_CLIENT.get_torrents()} 
-        TRANSMISSION_HASH_CACHE = torrent_hashes
+        torrent_hashes = {torrent.hashString.lower() for torrent in TR_CLIENT.get_torrents(arguments=["id", "hashString"])}
+        TRANSMISSION_HASH_CACHE.replace(torrent_hashes)
         LAST_CACHE_UPDATE = time.time()
-        logger.info(f"缓存更新完成，当前种子数量: {len(TRANSMISSION_HASH_CACHE)}")
+        logger.info("缓存更新完成，当前种子数量: %s", len(TRANSMISSION_HASH_CACHE))
+        return True
     except Exception as e:
-        logger.error(f"更新缓存失败: {str(e)}")
+        logger.error("更新缓存失败: %s", e)
+        return False
 
 
-def is_torrent_in_transmission(torrent_id):
-    """检查种子是否已在Transmission中（通过哈希对比）"""
+def is_torrent_in_transmission(torrent_id, torrent_hash=None):
+    """检查种子是否已在Transmission中（通过哈希对比），已计算过本地种子文件哈希时可直接传入"""
     global TR_CLIENT
     try:
         # 确保客户端已初始化
@@ -325,33 +337,40 @@ def is_torrent_in_transmission(torrent_id):
         # 检查缓存是否过期，过期则更新
         current_time = time.time()
         if current_time - LAST_CACHE_UPDATE > CACHE_EXPIRY_TIME:
-            update_transmission_cache()
-        torrent_hashes = TRANSMISSION_HASH_CACHE
-
-        # 构建本地种子文件路径
-        torrent_file = os.path.join(DOWNLOAD_DIR, f"mteam.{torrent_id}.torrent")
+            with CACHE_UPDATE_LOCK:
+                # 等待锁期间其他线程可能已完成刷新
+                if time.time() - LAST_CACHE_UPDATE > CACHE_EXPIRY_TIME:
+                    update_transmission_cache()
+        torrent_hashes = TRANSMISSION_HASH_CACHE.snapshot()
 
         # 如果本地文件存在，计算哈希值并检查
-        if os.path.exists(torrent_file):
-            try:
-                local_hash = get_torrent_hash(torrent_file)
-                if local_hash and local_hash.lower() in torrent_hashes:
-                    logger.info(f"种子已在Transmission中（哈希匹配）: {torrent_file}")
-                    return True
-            except HashError as e:
-                logger.warning(f"计算哈希失败，跳过检查: {str(e)}")
+        local_hash = torrent_hash or get_local_torrent_hash(torrent_id)
+        if local_hash and local_hash.lower() in torrent_hashes:
+            logger.info("种子已在Transmission中（哈希匹配）: mteam.%s.torrent", torrent_id)
+            return True
 
         # 本地文件不存在或哈希不匹配
         return False
     except Exception as e:
-        logger.error(f"检查Transmission种子失败: {str(e)}")
+        logger.error("检查Transmission种子失败: %s", e)
         # 连接可能已断开，尝试重新初始化
         TR_CLIENT = None
         return False
 
+def get_local_torrent_hash(torrent_id):
+    """计算本地种子文件的哈希值，文件不存在或计算失败时返回None"""
+    torrent_file = os.path.join(get_config().download_dir, f"mteam.{torrent_id}.torrent")
+    if not os.path.exists(torrent_file):
+        return None
+    try:
+        return get_torrent_hash(torrent_file)
+    except HashError as e:
+        logger.warning("计算哈希失败，跳过检查: %s", e)
+        return None
+
 def add_to_transmission(torrent_file):
     """添加种子到Transmission"""
-    global TR_CLIENT, TRANSMISSION_HASH_CACHE, LAST_CACHE_UPDATE
+    global TR_CLIENT, LAST_CACHE_UPDATE
     try:
         # 确保客户端已初始化
         if not TR_CLIENT:
@@ -378,68 +397,122 @@ def add_to_transmission(torrent_file):
         try:
             torrent = TR_CLIENT.add_torrent(
                 torrent=torrent_content,
-                download_dir=SAVE_PATH,
-                labels=LABELS,
+                download_dir=get_config().save_path,
+                labels=get_config().labels,
                 paused=False
             )
-            logger.info(f"已添加到Transmission: {torrent.name}")
+            logger.info("已添加到Transmission: %s", torrent.name)
             
             # 添加种子哈希到缓存
             torrent_hash = torrent.hashString.lower()
-            if torrent_hash not in TRANSMISSION_HASH_CACHE:
-                TRANSMISSION_HASH_CACHE.add(torrent_hash)
+            if TRANSMISSION_HASH_CACHE.add(torrent_hash):
                 LAST_CACHE_UPDATE = time.time()
-                logger.info(f"已将种子哈希 {torrent_hash} 添加到缓存")
+                logger.info("已将种子哈希 %s 添加到缓存", torrent_hash)
             
             return True
         except Exception as e1:
-            logger.error(f"添加种子到Transmission失败: {str(e1)}")
+            logger.error("添加种子到Transmission失败: %s", e1)
             raise TransmissionError(f"添加种子到Transmission失败: {str(e1)}")
 
     except Exception as e:
-        logger.error(f"操作Transmission失败: {str(e)}")
+        logger.error("操作Transmission失败: %s", e)
         # 连接可能已断开，尝试重新初始化
         TR_CLIENT = None
         return False
 
 def process_single_torrent(torrent, total_downloaded, state_manager):
-    """处理单个种子"""
-    logger.info(f"处理中 [{total_downloaded+1}/{MAX_DOWNLOAD_COUNT}]: {torrent['title']}")
+    """处理单个种子，成功添加到Transmission时返回True"""
+    config = get_config()
+    logger.info("处理中 [%s/%s]: %s", total_downloaded+1, config.max_download_count, torrent['title'])
 
     # 检查种子是否已处理过
     if state_manager.is_torrent_processed(torrent['id']):
-        logger.info(f"种子 {torrent['id']} 已处理过，跳过")
+        logger.info("种子 %s 已处理过，跳过", torrent['id'])
+        return False
+
+    # 检查种子是否已被淘汰，淘汰过的种子不再添加，也不消耗下载配额
+    if state_manager.is_torrent_id_evicted(torrent['id']):
+        logger.info("种子 %s 已被做种池淘汰，跳过", torrent['id'])
+        state_manager.add_processed_torrent(torrent['id'])
         return False
 
+    # 本地种子文件只计算一次哈希，供后续检查复用
+    torrent_hash = get_local_torrent_hash(torrent['id'])
+
     # 检查种子是否已在Transmission中
-    if is_torrent_in_transmission(torrent['id']):
+    if is_torrent_in_transmission(torrent['id'], torrent_hash):
         logger.info("种子已在Transmission中，跳过处理")
         # 标记为已处理
         state_manager.add_processed_torrent(torrent['id'])
         return False
 
+    # 只记录了哈希的旧淘汰记录需要通过本地种子文件判断
+    if torrent_hash and state_manager.is_torrent_evicted(torrent_hash):
+        logger.info("种子 %s 已被做种池淘汰，跳过", torrent['id'])
+        state_manager.add_processed_torrent(torrent['id'])
+        return False
+
     # 下载种子文件
     torrent_file = download_torrent(torrent['id'], state_manager)
 
     if torrent_file:
         # 添加到Transmission
-        if add_to_transmission(torrent_file):
+        added = add_to_transmission(torrent_file)
+        if added:
             logger.info("添加成功")
+            # 记录哈希对应的种子ID，被淘汰后无需下载即可跳过
+            try:
+                state_manager.add_added_torrent(torrent['id'], torrent_hash or get_torrent_hash(torrent_file))
+            except HashError as e:
+                logger.warning("计算哈希失败，无法记录种子ID: %s", e)
             # 遵守请求间隔
-            time.sleep(REQUEST_INTERVAL)
+            time.sleep(config.request_interval)
         else:
             logger.error("添加失败")
         # 标记为已处理
         state_manager.add_processed_torrent(torrent['id'])
-        return True
+        return added
     return False
 
-def main():
+def process_admitted_torrent(torrent, total_downloaded, state_manager, admission):
+    """处理已通过容量准入的种子，结束后结算预留的空间"""
+    size = torrent.get('size', 0)
+    added = False
+    try:
+        added = process_single_torrent(torrent, total_downloaded, state_manager)
+    finally:
+        if added:
+            admission.commit(size)
+        else:
+            admission.release(size)
+    return added
+
+def evict_seeding_pool(evictor, state_manager, admission):
+    """做种池超出上限时淘汰价值最低的种子，并同步哈希缓存和剩余空间，返回被淘汰种子的哈希列表"""
+    if not evictor.enabled:
+        return []
+    try:
+        evicted = evictor.evict(state_manager)
+    except Exception as e:
+        logger.error("做种池淘汰失败: %s", e)
+        return []
+    for torrent_hash in evicted:
+        TRANSMISSION_HASH_CACHE.discard(torrent_hash)
+    if evicted:
+        state_manager.save_state()
+        if evictor.delete_data:
+            # 删除数据后磁盘空间已释放，重新获取剩余空间
+            admission.refresh()
+    return evicted
+
+def run(profiler=None):
+    """按页获取官种并添加到Transmission"""
+    config = get_config()
     # 确保下载目录存在
-    os.makedirs(DOWNLOAD_DIR, exist_ok=True)
+    os.makedirs(config.download_dir, exist_ok=True)
 
     # 初始化状态管理器
-    state_manager = StateManager()
+    state_manager = StateManager(profiler=profiler)
 
     # 初始化Transmission客户端
     try:
@@ -447,72 +520,232 @@ def main():
         # 初始化种子哈希缓存
         update_transmission_cache()
     except TransmissionError as e:
-        logger.error(f"无法连接到Transmission，程序退出: {str(e)}")
+        logger.error("无法连接到Transmission，程序退出: %s", e)
         return
 
+    # 磁盘容量准入控制，空间不足前暂停下载新种子
+    admission = AdmissionController(get_transmission_client, config.save_path,
+                                     config.free_space_reserve, config.free_space_check_interval)
+    # 做种池淘汰，保持Transmission中的种子数量和体积在上限内
+    evictor = SeedingPoolEvictor(get_transmission_client, config.labels,
+                                 config.eviction_max_count, config.eviction_max_total_size,
+                                 config.eviction_policy, config.eviction_batch_size,
+                                 config.eviction_delete_data, config.eviction_min_seed_days,
+                                 config.eviction_refresh_interval)
+    evict_seeding_pool(evictor, state_manager, admission)
+
     total_downloaded = 0
-    # 从上次停止的页码开始
-    page_number = state_manager.get_last_page()
+    # 每个制作组/分类组合作为独立的查询流并发翻页，从各自的检查点继续
+    streams = build_query_streams(config.teams, config.categories, state_manager)
+    # 查询线程同样记录性能分析数据
+    fetch_page = profiler.wrap(fetch_query_page) if profiler else fetch_query_page
+    # 所有查询流共享请求间隔，避免并发搜索触发M-Team限流
+    fanout = QueryFanOut(streams, fetch_page, config.page_size, config.max_query_workers,
+                         retry_interval=config.request_interval, request_interval=config.request_interval)
+    fanout.start()
 
     try:
-        while total_downloaded < MAX_DOWNLOAD_COUNT:
-            logger.info(f"正在获取第 {page_number} 页馒头官种列表...")
-            
-            # 获取官种列表（指定页码）
-            try:
-                torrents = get_mteam_torrents(page_number)
-            except APIError as e:
-                logger.error(f"获取种子列表失败: {str(e)}")
-                # 等待一段时间后重试
-                time.sleep(REQUEST_INTERVAL)
-                continue
-            
+        for stream, page_number, torrents in fanout.pages():
             if not torrents:
-                logger.info(f"第 {page_number} 页未找到找到匹配的种子，自动开始搜索下一页")
-                # 更新最后处理的页码
-                state_manager.update_last_page(page_number)
+                logger.info("查询 %s 第 %s 页未找到找到匹配的种子，自动开始搜索下一页", stream.key, page_number)
+                # 更新该查询流最后处理的页码
+                state_manager.update_query_page(stream.key, page_number)
                 # 保存状态
                 state_manager.save_state()
-            
-                # 进入下一页
-                page_number += 1
                 continue
             
-            logger.info(f"第 {page_number} 页找到 {len(torrents)} 个匹配的种子")
+            logger.info("查询 %s 第 %s 页找到 %s 个匹配的种子", stream.key, page_number, len(torrents))
             
             # 批量处理种子 - 使用线程池并行处理
-            with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-                futures = []
-                for torrent in torrents:
-                    if total_downloaded >= MAX_DOWNLOAD_COUNT:
-                        break
-                    # 跳过已处理的种子
-                    if state_manager.is_torrent_processed(torrent['id']):
-                        logger.info(f"种子 {torrent['id']} 已处理过，跳过")
-                        continue
-                    future = executor.submit(process_single_torrent, torrent, total_downloaded, state_manager)
-                    futures.append(future)
-                    total_downloaded += 1
-                
-                # 等待所有任务完成
-                concurrent.futures.wait(futures)
+            task = profiler.wrap(process_admitted_torrent) if profiler else process_admitted_torrent
+            # 淘汰释放空间后会再次处理本页，已提交过的种子不再重复提交
+            submitted = set()
+            while True:
+                with concurrent.futures.ThreadPoolExecutor(max_workers=config.max_workers) as executor:
+                    futures = {}
+                    for torrent in torrents:
+                        if total_downloaded >= config.max_download_count:
+                            break
+                        if torrent['id'] in submitted:
+                            continue
+                        # 跳过已处理的种子
+                        if state_manager.is_torrent_processed(torrent['id']):
+                            logger.info("种子 %s 已处理过，跳过", torrent['id'])
+                            continue
+                        # 下载种子文件前先检查磁盘空间，避免浪费下载配额
+                        if not admission.admit(torrent.get('size', 0)):
+                            break
+                        future = executor.submit(task, torrent, total_downloaded, state_manager, admission)
+                        futures[future] = torrent
+                        submitted.add(torrent['id'])
+                        total_downloaded += 1
                 
-            
-            # 更新最后处理的页码
-            state_manager.update_last_page(page_number)
+                    # 等待所有任务完成
+                    concurrent.futures.wait(futures)
+                    # 新添加的种子计入做种池，无需重新获取所有种子的统计
+                    for future, torrent in futures.items():
+                        if not future.exception() and future.result():
+                            evictor.note_added(torrent.get('size', 0))
+
+                # 新添加的种子可能使做种池超出上限；磁盘空间不足时，淘汰并删除数据也是唯一能释放空间的途径
+                evicted = evict_seeding_pool(evictor, state_manager, admission)
+                if not admission.paused:
+                    break
+                # 淘汰后已重新获取剩余空间，空间足够时继续处理本页剩余的种子
+                if not (evicted and evictor.delete_data and admission.resume()):
+                    break
+                logger.info("做种池淘汰释放了磁盘空间，继续下载")
+
+            if admission.paused:
+                # 不更新页码，空间释放后从本页继续
+                logger.warning("磁盘空间不足，停止下载新种子")
+                break
+
+            # 更新该查询流最后处理的页码
+            state_manager.update_query_page(stream.key, page_number)
             # 保存状态
             state_manager.save_state()
-            
-            # 进入下一页
-            page_number += 1
+
+            if total_downloaded >= config.max_download_count:
+                break
+        else:
+            logger.info("所有查询均已到达最后一页")
     
     except KeyboardInterrupt:
         logger.info("程序已被用户中断")
     finally:
+        fanout.stop()
         # 保存最终状态
         state_manager.save_state()
     
-    logger.info(f"共下载 {total_downloaded} 个种子")
+    logger.info("共下载 %s 个种子", total_downloaded)
+
+def run_command(args):
+    """run子命令：执行自动下载"""
+    # 开启性能分析（--profile）
+    profiler = None
+    if args.profile:
+        from profiler import RunProfiler
+        profiler = RunProfiler(args.profile_dir)
+        profiler.start()
+        # 下载配额用尽时会强制退出，也要写出性能分析结果
+        EXIT_HOOKS.append(profiler.stop)
+    try:
+        run(profiler)
+    finally:
+        if profiler:
+            EXIT_HOOKS.remove(profiler.stop)
+            profiler.stop()
+
+def status_command(args):
+    """status子命令：输出当前状态，不连接Transmission和M-Team"""
+    state_manager = StateManager()
+    print(f"状态文件: {state_manager.state_file}")
+    print(f"已处理种子数: {len(state_manager.state['processed_torrent_ids'])}")
+    query_pages = state_manager.state['query_pages']
+    if not query_pages:
+        # 尚未按查询流保存检查点时，显示旧版的全局页码
+        print(f"最后处理页码: {state_manager.get_last_page()}")
+    for query_key, page_number in sorted(query_pages.items()):
+        print(f"查询 {query_key} 最后处理页码: {page_number}")
+
+def reconcile_command(args):
+    """reconcile子命令：根据本地种子文件和Transmission中的种子校正已处理状态"""
+    config = get_config()
+    state_manager = StateManager()
+    try:
+        init_transmission_client()
+    except TransmissionError as e:
+        logger.error("无法连接到Transmission，程序退出: %s", e)
+        return
+    # 获取不到Transmission中的种子时不能判断是否缺失，不修改状态
+    if not update_transmission_cache():
+        logger.error("无法获取Transmission种子列表，未修改状态，程序退出")
+        return
+
+    marked = 0
+    missing = []
+    filenames = sorted(os.listdir(config.download_dir)) if os.path.isdir(config.download_dir) else []
+    for filename in filenames:
+        if not (filename.startswith("mteam.") and filename.endswith(".torrent")):
+            continue
+        torrent_id = filename[len("mteam."):-len(".torrent")]
+        try:
+            torrent_hash = get_torrent_hash(os.path.join(config.download_dir, filename)).lower()
+        except HashError:
+            continue
+        in_transmission = torrent_hash in TRANSMISSION_HASH_CACHE
+        processed = state_manager.is_torrent_processed(torrent_id)
+        if in_transmission and not processed:
+            state_manager.add_processed_torrent(torrent_id)
+            marked += 1
+        elif (processed and not in_transmission and not state_manager.is_torrent_evicted(torrent_hash)
+              and not state_manager.is_torrent_id_evicted(torrent_id)):
+            # 被做种池淘汰的种子本就不在Transmission中，不算缺失
+            missing.append(torrent_id)
+
+    if args.forget_missing:
+        for torrent_id in missing:
+            state_manager.remove_processed_torrent(torrent_id)
+    state_manager.save_state()
+    logger.info("校正完成: 新标记 %s 个已在Transmission中的种子，%s 个已处理种子不在Transmission中%s",
+                marked, len(missing), "（已移出已处理列表）" if args.forget_missing else "")
+
+COMMANDS = {
+    "run": run_command,
+    "status": status_command,
+    "reconcile": reconcile_command,
+}
+
+def parse_args(argv=None):
+    """解析命令行参数，未指定子命令时默认执行run"""
+    parser = argparse.ArgumentParser(description="M-Team 自动种子上传工具")
+    parser.add_argument("-c", "--config", default="config.yaml", help="配置文件路径")
+    parser.add_argument("--profile", action="store_true", help="记录cProfile和tracemalloc性能分析数据")
+    parser.add_argument("--profile-dir", default="profile", help="性能分析结果输出目录")
+    subparsers = parser.add_subparsers(dest="command")
+
+    run_parser = subparsers.add_parser("run", help="下载官种并添加到Transmission（默认）")
+    run_parser.add_argument("--profile", action="store_true", default=argparse.SUPPRESS, help="记录cProfile和tracemalloc性能分析数据")
+    run_parser.add_argument("--profile-dir", default=argparse.SUPPRESS, help="性能分析结果输出目录")
+
+    subparsers.add_parser("status", help="查看已处理种子数和页码进度")
+
+    reconcile_parser = subparsers.add_parser("reconcile", help="根据Transmission中的种子校正已处理状态")
+    reconcile_parser.add_argument("--forget-missing", action="store_true", help="将不在Transmission中的种子移出已处理列表")
+
+    args = parser.parse_args(argv)
+    if args.command is None:
+        args.command = "run"
+    return args
+
+def main(argv=None):
+    """命令行入口"""
+    args = parse_args(argv)
+    set_config_path(args.config)
+
+    # status不需要读取配置文件，直接输出
+    if args.command == "status":
+        status_command(args)
+        return
+
+    try:
+        config = get_config()
+    except ConfigError as e:
+        print(e, file=sys.stderr)
+        sys.exit(2)
+
+    # 初始化异步日志（后台线程写入，配置来自config.yaml的logging部分）
+    from log_setup import setup_logging, shutdown_logging
+    log_listener = setup_logging(config.logging)
+    # 下载配额用尽时会强制退出，先写出队列中剩余的日志
+    exit_hook = lambda: shutdown_logging(log_listener)
+    EXIT_HOOKS.append(exit_hook)
+    try:
+        COMMANDS[args.command](args)
+    finally:
+        EXIT_HOOKS.remove(exit_hook)
+        shutdown_logging(log_listener)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,131 @@
+import os
+import io
+import re
+import time
+import pstats
+import cProfile
+import logging
+import threading
+import tracemalloc
+
+logger = logging.getLogger("MT_Auto_Seed")
+
+class RunProfiler:
+    """运行性能分析器，记录cProfile数据和tracemalloc内存快照"""
+    def __init__(self, output_dir="profile", top_n=30):
+        self.output_dir = output_dir
+        self.top_n = top_n
+        self.main_profile = cProfile.Profile()
+        # 每个检查点的 (标签, 时间, 相对上一个快照的内存增长字节数)
+        self.checkpoints = []
+        # 只保留起始快照和上一个快照，避免快照本身占用大量内存
+        self._start_snapshot = None
+        self._last_snapshot = None
+        self._thread_profiles = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stopped = False
+
+    def start(self):
+        """开始记录整个运行过程"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        tracemalloc.start()
+        self.snapshot("start")
+        self.main_profile.enable()
+        logger.info("性能分析已开启，结果将写入: %s", self.output_dir)
+
+    def wrap(self, func):
+        """包装工作线程任务，按线程分别记录cProfile数据"""
+        def wrapper(*args, **kwargs):
+            profile = getattr(self._local, "profile", None)
+            if profile is False:
+                return func(*args, **kwargs)
+            new_profile = profile is None
+            if new_profile:
+                profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                # Python 3.12+ 同一时间只允许一个分析器，此时工作线程已被主分析器覆盖
+                self._local.profile = False
+                return func(*args, **kwargs)
+            if new_profile:
+                # 只登记成功开启的分析器，避免写出空的数据文件
+                self._local.profile = profile
+                with self._lock:
+                    self._thread_profiles.setdefault(threading.current_thread().name, []).append(profile)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profile.disable()
+        return wrapper
+
+    def snapshot(self, label):
+        """记录一次tracemalloc快照并计算相对上一个快照的内存增长（在状态检查点调用）"""
+        if not tracemalloc.is_tracing():
+            return
+        with self._lock:
+            # 排除tracemalloc自身的内存分配
+            current = tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+            growth = 0
+            if self._last_snapshot is not None:
+                growth = sum(stat.size_diff for stat in current.compare_to(self._last_snapshot, "lineno"))
+            if self._start_snapshot is None:
+                self._start_snapshot = current
+            self._last_snapshot = current
+            self.checkpoints.append((label, time.time(), growth))
+
+    def stop(self):
+        """停止记录并写出cProfile数据和摘要（可重复调用，只执行一次）"""
+        with self._lock:
+            if self._stopped:
+                return
+            self._stopped = True
+        self.main_profile.disable()
+        self.snapshot("stop")
+        tracemalloc.stop()
+
+        self.main_profile.dump_stats(os.path.join(self.output_dir, "main.prof"))
+        thread_files = []
+        with self._lock:
+            thread_profiles = dict(self._thread_profiles)
+        for thread_name, profiles in thread_profiles.items():
+            for index, profile in enumerate(profiles):
+                if not profile.getstats():
+                    continue
+                # 查询线程名包含制作组和分类，替换掉不能用于文件名的字符
+                safe_name = re.sub(r"[^\w.-]", "_", thread_name)
+                filename = os.path.join(self.output_dir, f"worker.{safe_name}.{index}.prof")
+                profile.dump_stats(filename)
+                thread_files.append(filename)
+
+        summary_file = os.path.join(self.output_dir, "summary.txt")
+        with open(summary_file, 'w', encoding='utf-8') as f:
+            f.write(self._format_summary(thread_files))
+        logger.info("性能分析结果已保存: %s", summary_file)
+
+    def _format_summary(self, thread_files):
+        """生成热点函数和内存增长摘要"""
+        out = io.StringIO()
+        if self.main_profile.getstats():
+            out.write(f"=== 热点函数 (主线程, 按累计耗时前 {self.top_n}) ===\n")
+            pstats.Stats(self.main_profile, stream=out).sort_stats("cumulative").print_stats(self.top_n)
+
+        if thread_files:
+            out.write(f"=== 热点函数 (工作线程合计, 按自身耗时前 {self.top_n}) ===\n")
+            stats = pstats.Stats(thread_files[0], stream=out)
+            for filename in thread_files[1:]:
+                stats.add(filename)
+            stats.sort_stats("tottime").print_stats(self.top_n)
+
+        out.write(f"=== 内存增长 (共 {len(self.checkpoints)} 个快照) ===\n")
+        for label, timestamp, growth in self.checkpoints[1:]:
+            moment = time.strftime("%H:%M:%S", time.localtime(timestamp))
+            out.write(f"[{moment}] {label}: {growth / 1024:+.1f} KiB\n")
+
+        if len(self.checkpoints) >= 2:
+            out.write(f"=== 内存增长最多的代码行 (前 {self.top_n}) ===\n")
+            diff = self._last_snapshot.compare_to(self._start_snapshot, "lineno")
+            for stat in diff[:self.top_n]:
+                out.write(f"{stat}\n")
+        return out.getvalue()
@@ -0,0 +1,127 @@
+import time
+import queue
+import logging
+import threading
+from exceptions import APIError
+
+logger = logging.getLogger("MT_Auto_Seed")
+
+class QueryStream:
+    """单个制作组/分类组合的查询流，拥有独立的页码检查点"""
+    def __init__(self, team, category, start_page=1):
+        self.team = team
+        self.category = category
+        self.key = f"team:{team}|category:{category}"
+        self.teams = [team]
+        self.categories = [category]
+        self.start_page = start_page
+
+def build_query_streams(teams, categories, state_manager):
+    """为每个制作组和分类的组合创建查询流，从各自的检查点继续"""
+    # 只有一个查询流时与旧版合并查询等价，可以沿用旧的全局页码
+    default_page = state_manager.get_last_page() if len(teams) * len(categories) == 1 else 1
+    streams = []
+    for team in teams:
+        for category in categories:
+            stream = QueryStream(team, category)
+            stream.start_page = state_manager.get_query_page(stream.key, default_page)
+            streams.append(stream)
+    return streams
+
+class QueryFanOut:
+    """并发执行多个查询流，把各流的结果页合并到同一个去重的队列中按顺序消费
+
+    每个查询流由独立线程按页获取，慢的或很大的查询流不会阻塞其他流；
+    队列长度有限，消费跟不上时查询线程会等待，不会无限超前翻页；
+    所有查询流共享请求间隔，两次请求的开始时间至少相隔request_interval秒。
+    """
+    def __init__(self, streams, fetch_page, page_size, max_concurrent_requests=4,
+                 retry_interval=25, queue_size=None, request_interval=0):
+        self.streams = streams
+        self.fetch_page = fetch_page
+        self.page_size = page_size
+        self.retry_interval = retry_interval
+        self.request_interval = request_interval
+        self._requests = threading.Semaphore(max_concurrent_requests)
+        self._interval_lock = threading.Lock()
+        self._next_request = 0
+        self._queue = queue.Queue(maxsize=queue_size or len(streams))
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        """启动所有查询流线程"""
+        for stream in self.streams:
+            thread = threading.Thread(target=self._crawl, args=(stream,),
+                                      name=f"Query-{stream.key}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        """通知所有查询流线程停止"""
+        self._stop.set()
+
+    def _put(self, item):
+        """放入结果队列，队列满时等待，收到停止信号后放弃"""
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _wait_request_interval(self):
+        """等待共享的请求间隔，返回False表示等待期间收到停止信号"""
+        with self._interval_lock:
+            now = time.monotonic()
+            delay = self._next_request - now
+            self._next_request = max(now, self._next_request) + self.request_interval
+        return delay <= 0 or not self._stop.wait(delay)
+
+    def _crawl(self, stream):
+        """按页获取单个查询流，直到最后一页或收到停止信号"""
+        page_number = stream.start_page
+        try:
+            while not self._stop.is_set():
+                try:
+                    with self._requests:
+                        if not self._wait_request_interval():
+                            return
+                        torrents, item_count = self.fetch_page(stream, page_number)
+                except APIError as e:
+                    logger.error("查询 %s 第 %s 页失败: %s", stream.key, page_number, e)
+                    # 等待一段时间后重试
+                    self._stop.wait(self.retry_interval)
+                    continue
+
+                last_page = item_count < self.page_size
+                if not self._put((stream, page_number, torrents)):
+                    return
+                if last_page:
+                    logger.info("查询 %s 已到达最后一页: 第 %s 页", stream.key, page_number)
+                    return
+                page_number += 1
+        finally:
+            # 通知消费者该查询流已结束
+            self._put((stream, None, None))
+
+    def pages(self):
+        """按到达顺序产出 (查询流, 页码, 种子列表)，所有查询流结束后停止
+
+        同一个种子出现在多个查询流中时只产出一次。
+        """
+        seen_ids = set()
+        active = len(self.streams)
+        while active:
+            stream, page_number, torrents = self._queue.get()
+            if page_number is None:
+                active -= 1
+                continue
+            unique = []
+            for torrent in torrents:
+                torrent_id = str(torrent['id'])
+                if torrent_id not in seen_ids:
+                    seen_ids.add(torrent_id)
+                    unique.append(torrent)
+            yield stream, page_number, unique
@@ -1,17 +1,28 @@
 import os
 import json
 import logging
+import threading
+from concurrent_sets import StripedSet
 
 logger = logging.getLogger("MT_Auto_Seed")
 
 class StateManager:
     """状态管理器，用于持久化程序运行状态"""
-    def __init__(self, state_file="state.json"):
+    def __init__(self, state_file="state.json", profiler=None):
         self.state_file = state_file
+        self.profiler = profiler
+        # 工作线程会并发写入已处理ID，使用线程安全集合
         self.state = {
-            "processed_torrent_ids": set(),
-            "last_page_number": 1
+            "processed_torrent_ids": StripedSet(),
+            "evicted_torrent_hashes": StripedSet(),
+            "evicted_torrent_ids": StripedSet(),
+            # 已添加种子的哈希到M-Team ID的映射，淘汰时据此记录被淘汰的ID
+            "added_torrent_ids": {},
+            "last_page_number": 1,
+            "query_pages": {}
         }
+        self._save_lock = threading.Lock()
+        self._save_count = 0
         self.load_state()
 
     def load_state(self):
@@ -20,40 +31,91 @@ class StateManager:
             if os.path.exists(self.state_file):
                 with open(self.state_file, 'r', encoding='utf-8') as f:
                     saved_state = json.load(f)
-                    self.state["processed_torrent_ids"] = set(saved_state.get("processed_torrent_ids", []))
+                    self.state["processed_torrent_ids"] = StripedSet(saved_state.get("processed_torrent_ids", []))
+                    self.state["evicted_torrent_hashes"] = StripedSet(saved_state.get("evicted_torrent_hashes", []))
+                    self.state["evicted_torrent_ids"] = StripedSet(saved_state.get("evicted_torrent_ids", []))
+                    self.state["added_torrent_ids"] = dict(saved_state.get("added_torrent_ids", {}))
                     self.state["last_page_number"] = saved_state.get("last_page_number", 1)
-                logger.info(f"成功加载状态: 已处理 {len(self.state['processed_torrent_ids'])} 个种子，最后处理到第 {self.state['last_page_number']} 页")
+                    self.state["query_pages"] = dict(saved_state.get("query_pages", {}))
+                logger.info("成功加载状态: 已处理 %s 个种子，%s 个查询的页码检查点", len(self.state['processed_torrent_ids']), len(self.state['query_pages']))
             else:
                 logger.info("状态文件不存在，使用默认状态")
         except Exception as e:
-            logger.error(f"加载状态失败: {str(e)}")
+            logger.error("加载状态失败: %s", e)
             # 保持默认状态
 
     def save_state(self):
         """保存当前状态"""
         try:
-            saved_state = {
-                "processed_torrent_ids": list(self.state["processed_torrent_ids"]),
-                "last_page_number": self.state["last_page_number"]
-            }
-            with open(self.state_file, 'w', encoding='utf-8') as f:
-                json.dump(saved_state, f, ensure_ascii=False, indent=2)
-            logger.info(f"成功保存状态: 已处理 {len(self.state['processed_torrent_ids'])} 个种子，最后处理到第 {self.state['last_page_number']} 页")
+            # 主线程和工作线程（如配额用尽时）可能同时保存，快照和写入都在锁内完成，
+            # 保证后保存的状态不会被先生成的旧快照覆盖
+            with self._save_lock:
+                saved_state = {
+                    "processed_torrent_ids": self.state["processed_torrent_ids"].snapshot(),
+                    "evicted_torrent_hashes": self.state["evicted_torrent_hashes"].snapshot(),
+                    "evicted_torrent_ids": self.state["evicted_torrent_ids"].snapshot(),
+                    "added_torrent_ids": dict(self.state["added_torrent_ids"]),
+                    "last_page_number": self.state["last_page_number"],
+                    "query_pages": dict(self.state["query_pages"])
+                }
+                # 先写临时文件再替换，避免写入中断时损坏状态文件
+                temp_file = f"{self.state_file}.tmp"
+                with open(temp_file, 'w', encoding='utf-8') as f:
+                    json.dump(saved_state, f, ensure_ascii=False, indent=2)
+                os.replace(temp_file, self.state_file)
+                self._save_count += 1
+            logger.info("成功保存状态: 已处理 %s 个种子，%s 个查询的页码检查点", len(saved_state['processed_torrent_ids']), len(saved_state['query_pages']))
         except Exception as e:
-            logger.error(f"保存状态失败: {str(e)}")
+            logger.error("保存状态失败: %s", e)
+
+        # 在页码检查点记录内存快照
+        if self.profiler:
+            self.profiler.snapshot(f"检查点 {self._save_count}")
 
     def add_processed_torrent(self, torrent_id):
         """添加已处理的种子ID"""
         self.state["processed_torrent_ids"].add(str(torrent_id))
 
+    def remove_processed_torrent(self, torrent_id):
+        """移除已处理的种子ID"""
+        self.state["processed_torrent_ids"].discard(str(torrent_id))
+
     def is_torrent_processed(self, torrent_id):
         """检查种子是否已处理"""
         return str(torrent_id) in self.state["processed_torrent_ids"]
 
+    def add_added_torrent(self, torrent_id, torrent_hash):
+        """记录已添加到Transmission的种子哈希对应的种子ID"""
+        self.state["added_torrent_ids"][torrent_hash.lower()] = str(torrent_id)
+
+    def add_evicted_torrent(self, torrent_hash):
+        """记录被淘汰的种子哈希和对应的种子ID，避免再次添加"""
+        torrent_hash = torrent_hash.lower()
+        self.state["evicted_torrent_hashes"].add(torrent_hash)
+        torrent_id = self.state["added_torrent_ids"].pop(torrent_hash, None)
+        if torrent_id is not None:
+            self.state["evicted_torrent_ids"].add(torrent_id)
+
+    def is_torrent_evicted(self, torrent_hash):
+        """检查种子是否已被淘汰"""
+        return torrent_hash.lower() in self.state["evicted_torrent_hashes"]
+
+    def is_torrent_id_evicted(self, torrent_id):
+        """按种子ID检查种子是否已被淘汰，无需下载或计算种子文件哈希"""
+        return str(torrent_id) in self.state["evicted_torrent_ids"]
+
     def update_last_page(self, page_number):
         """更新最后处理的页码"""
         self.state["last_page_number"] = page_number
 
     def get_last_page(self):
         """获取最后处理的页码"""
-        return self.state["last_page_number"]
\ No newline at end of file
+        return self.state["last_page_number"]
+
+    def update_query_page(self, query_key, page_number):
+        """更新单个查询流最后处理的页码"""
+        self.state["query_pages"][query_key] = page_number
+
+    def get_query_page(self, query_key, default=1):
+        """获取单个查询流最后处理的页码"""
+        return self.state["query_pages"].get(query_key, default)
\ No newline at end of file
@@ -10,15 +10,23 @@ from unittest.mock import patch, MagicMock
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from main import (
-    load_config,
     get_mteam_torrents,
     download_torrent,
     add_to_transmission,
     is_torrent_in_transmission,
-    process_single_torrent
+    process_single_torrent,
+    process_admitted_torrent,
+    status_command
 )
+from config import Config, set_config, load_config
+from concurrent_sets import StripedSet, CopyOnWriteSet
+from admission import AdmissionController
+from eviction import SeedingPoolEvictor
+from query_fanout import QueryFanOut, build_query_streams
 from exceptions import ConfigError, APIError
 from state_manager import StateManager
+from profiler import RunProfiler
+from log_setup import setup_logging, shutdown_logging, RateLimitFilter
 
 class TestMTAutoSeed(unittest.TestCase):
     def setUp(self):
@@ -62,7 +70,19 @@ class TestMTAutoSeed(unittest.TestCase):
         # 初始化状态管理器
         self.state_manager = StateManager(os.path.join(self.temp_dir, "state.json"))
 
+        # 设置运行配置（不依赖工作目录中的config.yaml）
+        self.config_data = {
+            "mt": {"user_agent": "test_agent", "api_key": "test_key", "teams": ["44"], "categories": [""]},
+            "transmission": {"host": "localhost", "port": 9091, "username": "test_user", "password": "test_pass",
+                             "save_path": "/downloads", "labels": ["MTeam官种"]},
+            "download": {"dir": self.test_config["DOWNLOAD"]["DIR"], "request_interval": 0, "max_download_count": 10,
+                         "page_size": 100, "max_retries": 3, "initial_retry_delay": 0, "max_workers": 1,
+                         "max_size": 1048576000, "min_size": 10485760}
+        }
+        set_config(Config(self.config_data))
+
     def tearDown(self):
+        set_config(None)
         # 恢复工作目录
         os.chdir(self.original_dir)
         # 删除临时目录
@@ -189,6 +209,14 @@ class TestMTAutoSeed(unittest.TestCase):
         result = process_single_torrent(torrent, 0, self.state_manager)
         self.assertFalse(result)
 
+        # 测试添加失败的种子：标记为已处理，但不算作已添加
+        mock_is_in.return_value = False
+        mock_add.return_value = False
+        torrent = {"id": 3, "title": "Add Failed"}
+        result = process_single_torrent(torrent, 0, self.state_manager)
+        self.assertFalse(result)
+        self.assertTrue(self.state_manager.is_torrent_processed(3))
+
     def test_state_manager(self):
         # 测试添加和检查已处理种子
         self.state_manager.add_processed_torrent(1)
@@ -205,5 +233,589 @@ class TestMTAutoSeed(unittest.TestCase):
         self.assertTrue(new_state_manager.is_torrent_processed(1))
         self.assertEqual(new_state_manager.get_last_page(), 5)
 
+    def test_run_profiler(self):
+        # 测试性能分析器记录工作线程数据和状态检查点快照
+        profile_dir = os.path.join(self.temp_dir, "profile")
+        profiler = RunProfiler(profile_dir)
+        profiler.start()
+        state_manager = StateManager(os.path.join(self.temp_dir, "state.json"), profiler=profiler)
+        task = profiler.wrap(lambda x: x * 2)
+        self.assertEqual(task(21), 42)
+        # 查询线程名中的特殊字符不会出现在文件名中
+        import threading
+        query_thread = threading.Thread(target=task, args=(1,), name="Query-team:1|category:")
+        query_thread.start()
+        query_thread.join()
+        state_manager.save_state()
+        profiler.stop()
+        self.assertTrue(all(":" not in name and "|" not in name for name in os.listdir(profile_dir)))
+
+        labels = [label for label, _, _ in profiler.checkpoints]
+        self.assertEqual(labels, ["start", "检查点 1", "stop"])
+        # 只保留起始快照和最后一个快照，检查点只记录内存增长数值
+        self.assertTrue(all(isinstance(growth, int) for _, _, growth in profiler.checkpoints))
+        self.assertIsNot(profiler._start_snapshot, profiler._last_snapshot)
+        self.assertTrue(os.path.exists(os.path.join(profile_dir, "main.prof")))
+        with open(os.path.join(profile_dir, "summary.txt"), encoding="utf-8") as f:
+            summary = f.read()
+        self.assertIn("热点函数", summary)
+        self.assertIn("内存增长", summary)
+
+    def test_run_profiler_enable_conflict(self):
+        # 测试工作线程分析器无法开启时（Python 3.12+）仍能生成摘要
+        import cProfile
+        profile_dir = os.path.join(self.temp_dir, "profile")
+        profiler = RunProfiler(profile_dir)
+        profiler.start()
+        task = profiler.wrap(lambda x: x + 1)
+        with patch.object(cProfile.Profile, "enable", side_effect=ValueError("Another profiling tool is already active")):
+            self.assertEqual(task(1), 2)
+            self.assertEqual(task(2), 3)
+        profiler.stop()
+
+        self.assertEqual(profiler._thread_profiles, {})
+        self.assertEqual(sorted(os.listdir(profile_dir)), ["main.prof", "summary.txt"])
+
+    @patch("main.os._exit")
+    def test_force_exit_runs_hooks(self, mock_exit):
+        # 测试强制退出前按注册的相反顺序执行清理函数
+        import main
+        calls = []
+        hooks = [lambda: calls.append("logging"), lambda: calls.append("profiler")]
+        main.EXIT_HOOKS.extend(hooks)
+        try:
+            main.force_exit(1)
+        finally:
+            for hook in hooks:
+                main.EXIT_HOOKS.remove(hook)
+            main.EXIT_LOCK.release()
+        self.assertEqual(calls, ["profiler", "logging"])
+        mock_exit.assert_called_once_with(1)
+
+    def test_rate_limit_filter(self):
+        # 测试同一处日志在时间窗口内被限流，窗口结束后附带抑制数量
+        import logging
+        rate_filter = RateLimitFilter(interval=60, max_repeats=2)
+        make_record = lambda: logging.LogRecord("MT_Auto_Seed", logging.DEBUG, "main.py", 10, "种子 %s 跳过", ("t",), None)
+        results = [rate_filter.filter(make_record()) for _ in range(5)]
+        self.assertEqual(results, [True, True, False, False, False])
+
+        # 模拟时间窗口结束
+        key = next(iter(rate_filter._windows))
+        started, count, suppressed = rate_filter._windows[key]
+        rate_filter._windows[key] = (started - 60, count, suppressed)
+        record = make_record()
+        self.assertTrue(rate_filter.filter(record))
+        self.assertIn("已抑制 3 条重复日志", record.getMessage())
+
+    def test_rate_limit_filter_distinct_messages(self):
+        # 测试内容不同的日志和WARNING及以上的日志不会被限流
+        import logging
+        rate_filter = RateLimitFilter(interval=60, max_repeats=1)
+        make_record = lambda level, torrent_id: logging.LogRecord(
+            "MT_Auto_Seed", level, "main.py", 10, "种子 %s 已处理过，跳过", (torrent_id,), None)
+        self.assertTrue(all(rate_filter.filter(make_record(logging.INFO, i)) for i in range(50)))
+        self.assertFalse(rate_filter.filter(make_record(logging.INFO, 0)))
+        self.assertTrue(all(rate_filter.filter(make_record(logging.ERROR, 0)) for _ in range(50)))
+
+        # 限流判断不在调用线程中格式化日志，不可哈希的参数不限流
+        record = make_record(logging.INFO, 1)
+        with patch.object(record, "getMessage", side_effect=AssertionError("formatted in caller")):
+            self.assertFalse(rate_filter.filter(record))
+        self.assertTrue(all(rate_filter.filter(make_record(logging.INFO, {"id": 1})) for _ in range(3)))
+
+    def test_force_exit_flushes_logs(self):
+        # 测试下载配额用尽强制退出时，队列中的日志全部写入文件
+        import subprocess
+        import yaml
+        log_file = os.path.join(self.temp_dir, "exit.log")
+        config_file = os.path.join(self.temp_dir, "exit_config.yaml")
+        self.config_data["logging"] = {"file": log_file}
+        with open(config_file, "w", encoding="utf-8") as f:
+            yaml.dump(self.config_data, f, allow_unicode=True)
+        code = (
+            "import logging, main\n"
+            "from unittest.mock import patch\n"
+            "def fake_run(profiler=None):\n"
+            "    for i in range(200):\n"
+            "        logging.getLogger('MT_Auto_Seed').info('record %s', i)\n"
+            "    main.force_exit(1)\n"
+            "with patch('main.run', fake_run):\n"
+            f"    main.main(['-c', {config_file!r}])\n"
+        )
+        result = subprocess.run([sys.executable, "-c", code], cwd=self.temp_dir, capture_output=True, text=True,
+                                env=dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(__file__))))
+        self.assertEqual(result.returncode, 1, result.stderr)
+        with open(log_file, encoding="utf-8") as f:
+            self.assertEqual(len(f.readlines()), 200)
+
+    def test_setup_logging_json(self):
+        # 测试异步日志以JSON Lines格式写入文件
+        import logging
+        log_file = os.path.join(self.temp_dir, "test.log")
+        listener = setup_logging({"level": "DEBUG", "file": log_file, "format": "json"})
+        logging.getLogger("MT_Auto_Seed").debug("种子 %s 大小 %s 不在指定范围内，跳过", "Test", 1)
+        shutdown_logging(listener)
+
+        with open(log_file, encoding="utf-8") as f:
+            entries = [json.loads(line) for line in f]
+        self.assertEqual(entries[-1]["level"], "DEBUG")
+        self.assertEqual(entries[-1]["message"], "种子 Test 大小 1 不在指定范围内，跳过")
+
+    def test_config_validation(self):
+        # 测试配置校验
+        config = Config(self.config_data)
+        self.assertEqual(config.tr_port, 9091)
+        self.assertEqual(config.logging, {})
+
+        # 字符串形式的端口和大小、纯数字的密码按旧版行为转换类型
+        self.config_data["transmission"]["port"] = "9091"
+        self.config_data["transmission"]["password"] = 123456
+        self.config_data["download"]["max_size"] = "1048576000"
+        config = Config(self.config_data)
+        self.assertEqual(config.tr_port, 9091)
+        self.assertEqual(config.tr_password, "123456")
+        self.assertEqual(config.max_size, 1048576000)
+        self.assertEqual(self.config_data["transmission"]["port"], "9091")
+
+        self.config_data["transmission"]["port"] = "abc"
+        with self.assertRaises(ConfigError) as cm:
+            Config(self.config_data)
+        self.assertIn("transmission.port", str(cm.exception))
+        self.config_data["transmission"]["port"] = 9091
+
+        self.config_data["download"]["max_workers"] = 0
+        with self.assertRaises(ConfigError) as cm:
+            Config(self.config_data)
+        self.assertIn("download.max_workers", str(cm.exception))
+
+        del self.config_data["mt"]["api_key"]
+        with self.assertRaises(ConfigError) as cm:
+            Config(self.config_data)
+        self.assertIn("mt.api_key", str(cm.exception))
+
+    def test_logging_config_validation(self):
+        # 测试logging配置段的校验：级别不区分大小写，错误的取值报告为ConfigError
+        self.config_data["logging"] = {"level": "info", "queue_size": "100", "rate_limit": {"interval": "30"}}
+        config = Config(self.config_data)
+        self.assertEqual(config.logging["level"], "INFO")
+        self.assertEqual(config.logging["queue_size"], 100)
+        self.assertEqual(config.logging["rate_limit"]["interval"], 30)
+
+        self.config_data["logging"] = {"level": "verbose", "format": "xml", "queue_size": -1,
+                                       "rate_limit": {"interval": "abc"}}
+        with self.assertRaises(ConfigError) as cm:
+            Config(self.config_data)
+        for key in ("logging.level", "logging.format", "logging.queue_size", "logging.rate_limit.interval"):
+            self.assertIn(key, str(cm.exception))
+
+    def test_parse_args(self):
+        # 测试未指定子命令时默认执行run，run子命令也接受--profile
+        from main import parse_args
+        args = parse_args([])
+        self.assertEqual(args.command, "run")
+        self.assertFalse(args.profile)
+        args = parse_args(["--profile"])
+        self.assertTrue(args.profile)
+        args = parse_args(["run", "--profile", "--profile-dir", "out"])
+        self.assertTrue(args.profile)
+        self.assertEqual(args.profile_dir, "out")
+        args = parse_args(["-c", "other.yaml", "reconcile", "--forget-missing"])
+        self.assertEqual(args.config, "other.yaml")
+        self.assertTrue(args.forget_missing)
+
+    @patch("transmission_rpc.Client")
+    def test_reconcile_rpc_failure(self, mock_client):
+        # 测试获取Transmission种子列表失败时reconcile不修改已处理状态
+        import main
+        from main import parse_args, reconcile_command
+        mock_client.return_value.get_torrents.side_effect = Exception("RPC timeout")
+        state_file = os.path.join(self.temp_dir, "state.json")
+        with open(os.path.join(self.test_config["DOWNLOAD"]["DIR"], "mteam.1.torrent"), "wb") as f:
+            f.write(b"d4:infod4:name1:a6:lengthi1e12:piece lengthi1e6:pieces20:aaaaaaaaaaaaaaaaaaaaee")
+        self.state_manager.add_processed_torrent(1)
+        self.state_manager.save_state()
+
+        main.TR_CLIENT = None
+        try:
+            with patch("main.StateManager", lambda: StateManager(state_file)):
+                reconcile_command(parse_args(["reconcile", "--forget-missing"]))
+        finally:
+            main.TR_CLIENT = None
+        self.assertTrue(StateManager(state_file).is_torrent_processed("1"))
+
+    def test_lazy_imports(self):
+        # 测试导入main模块时不加载配置和重量级依赖
+        import subprocess
+        code = "import sys, main; print(sorted(m for m in ('requests', 'transmission_rpc', 'torrentool', 'yaml') if m in sys.modules))"
+        result = subprocess.run([sys.executable, "-c", code], cwd=self.temp_dir, capture_output=True, text=True,
+                                env=dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(__file__))))
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip(), "[]")
+
+    def test_concurrent_state_save(self):
+        # 测试工作线程写入已处理ID的同时保存状态不会出错或丢失数据
+        import threading
+        def worker(start):
+            for i in range(start, start + 500):
+                self.state_manager.add_processed_torrent(i)
+        threads = [threading.Thread(target=worker, args=(n * 500,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        while any(thread.is_alive() for thread in threads):
+            self.state_manager.save_state()
+        for thread in threads:
+            thread.join()
+        self.state_manager.save_state()
+
+        new_state_manager = StateManager(os.path.join(self.temp_dir, "state.json"))
+        self.assertEqual(len(new_state_manager.state["processed_torrent_ids"]), 4000)
+        self.assertTrue(new_state_manager.is_torrent_processed(3999))
+
+    def test_concurrent_save_order(self):
+        # 测试两次并发保存时，先生成的旧快照不会覆盖后保存的新状态
+        import threading
+        processed = self.state_manager.state["processed_torrent_ids"]
+        original_snapshot = processed.snapshot
+        first_snapshot_taken = threading.Event()
+        release_first = threading.Event()
+
+        def slow_snapshot():
+            items = original_snapshot()
+            if not first_snapshot_taken.is_set():
+                first_snapshot_taken.set()
+                release_first.wait(5)
+            return items
+
+        processed.snapshot = slow_snapshot
+        first = threading.Thread(target=self.state_manager.save_state)
+        first.start()
+        first_snapshot_taken.wait(5)
+        self.state_manager.add_processed_torrent("new")
+        second = threading.Thread(target=self.state_manager.save_state)
+        second.start()
+        second.join(0.2)
+        release_first.set()
+        first.join()
+        second.join()
+
+        new_state_manager = StateManager(os.path.join(self.temp_dir, "state.json"))
+        self.assertTrue(new_state_manager.is_torrent_processed("new"))
+
+    def test_concurrent_sets(self):
+        # 测试分段集合和写时复制集合的基本操作及快照语义
+        striped = StripedSet(["a", "b"], stripes=4)
+        striped.add("c")
+        striped.discard("a")
+        self.assertEqual(sorted(striped.snapshot()), ["b", "c"])
+        self.assertIn("b", striped)
+        self.assertEqual(len(striped), 2)
+
+        cow = CopyOnWriteSet(["x"])
+        snapshot = cow.snapshot()
+        self.assertTrue(cow.add("y"))
+        self.assertFalse(cow.add("y"))
+        self.assertEqual(snapshot, frozenset(["x"]))
+        cow.replace(["z"])
+        self.assertNotIn("x", cow)
+        self.assertEqual(set(cow), {"z"})
+
+    def test_admission_controller(self):
+        # 测试按剩余空间、未完成种子大小和预留空间进行准入
+        GiB = 1024 ** 3
+        client = MagicMock()
+        client.free_space.return_value = 100 * GiB
+        queued = MagicMock(download_dir="/downloads/", left_until_done=30 * GiB)
+        other_volume = MagicMock(download_dir="/other", left_until_done=500 * GiB)
+        # 前缀相同的兄弟目录不属于save_path
+        sibling = MagicMock(download_dir="/downloads2", left_until_done=500 * GiB)
+        client.get_torrents.return_value = [queued, other_volume, sibling]
+        admission = AdmissionController(lambda: client, "/downloads", reserve=10 * GiB)
+
+        # 可用空间 100 - 30 = 70 GiB，预留10 GiB
+        self.assertTrue(admission.admit(40 * GiB))
+        admission.commit(40 * GiB)
+        self.assertTrue(admission.admit(15 * GiB))
+        admission.release(15 * GiB)
+        self.assertTrue(admission.admit(20 * GiB))
+        self.assertFalse(admission.paused)
+        admission.commit(20 * GiB)
+
+        # 剩余 10 GiB 已到预留线，拒绝并暂停后续下载
+        self.assertFalse(admission.admit(1))
+        self.assertTrue(admission.paused)
+        self.assertFalse(admission.admit(0))
+        client.free_space.assert_called_once_with("/downloads")
+
+    def test_admission_unknown_free_space(self):
+        # 测试Transmission未返回剩余空间时不阻止下载
+        client = MagicMock()
+        client.free_space.return_value = None
+        client.get_torrents.return_value = []
+        admission = AdmissionController(lambda: client, "/downloads", reserve=1)
+        self.assertTrue(admission.admit(10 ** 12))
+
+    @patch("main.process_single_torrent")
+    def test_process_admitted_torrent(self, mock_process):
+        # 测试只有成功添加的种子才占用预留空间，添加失败时释放
+        admission = MagicMock()
+        torrent = {"id": 1, "title": "Test Torrent", "size": 100}
+        mock_process.return_value = True
+        self.assertTrue(process_admitted_torrent(torrent, 0, self.state_manager, admission))
+        admission.commit.assert_called_once_with(100)
+
+        admission.reset_mock()
+        mock_process.return_value = False
+        self.assertFalse(process_admitted_torrent(torrent, 0, self.state_manager, admission))
+        admission.release.assert_called_once_with(100)
+        admission.commit.assert_not_called()
+
+    def make_seeding_torrent(self, torrent_id, ratio, seeders, idle_days, size, labels=("MTeam官种",), percent_done=1.0):
+        # 构造带有做种统计字段的模拟Transmission种子
+        from datetime import datetime, timedelta
+        now = datetime.now()
+        torrent = MagicMock()
+        torrent.id = torrent_id
+        torrent.hashString = f"HASH{torrent_id}"
+        torrent.name = f"torrent-{torrent_id}"
+        torrent.labels = list(labels)
+        torrent.ratio = ratio
+        torrent.total_size = size
+        torrent.percent_done = percent_done
+        torrent.added_date = now - timedelta(days=30)
+        torrent.activity_date = now - timedelta(days=idle_days)
+        torrent.tracker_stats = [MagicMock(seeder_count=seeders)]
+        return torrent
+
+    def test_seeding_pool_eviction(self):
+        # 测试超出数量上限时按价值分批淘汰，并记录到状态中
+        client = MagicMock()
+        client.get_torrents.return_value = [
+            self.make_seeding_torrent(1, ratio=5.0, seeders=2, idle_days=0, size=10),
+            self.make_seeding_torrent(2, ratio=0.1, seeders=80, idle_days=20, size=10),
+            self.make_seeding_torrent(3, ratio=0.5, seeders=40, idle_days=5, size=10),
+            self.make_seeding_torrent(4, ratio=0.0, seeders=90, idle_days=30, size=10, percent_done=0.5),
+            self.make_seeding_torrent(5, ratio=0.0, seeders=90, idle_days=30, size=10, labels=("其他",)),
+        ]
+        self.state_manager.add_added_torrent(102, "HASH2")
+        evictor = SeedingPoolEvictor(lambda: client, ["MTeam官种"], max_count=2, batch_size=1)
+        evicted = evictor.evict(self.state_manager)
+
+        # 未完成的4号和其他标签的5号不参与淘汰，2号价值最低
+        self.assertEqual(evicted, ["hash2", "hash3"])
+        self.assertEqual(client.remove_torrent.call_count, 2)
+        client.remove_torrent.assert_any_call([2], delete_data=True)
+        self.assertTrue(self.state_manager.is_torrent_evicted("HASH2"))
+        self.assertFalse(self.state_manager.is_torrent_evicted("hash1"))
+        # 添加时记录过哈希的种子同时按ID记录淘汰
+        self.assertTrue(self.state_manager.is_torrent_id_evicted(102))
+        self.assertFalse(self.state_manager.is_torrent_id_evicted(103))
+
+        # 淘汰记录可以持久化
+        self.state_manager.save_state()
+        new_state_manager = StateManager(os.path.join(self.temp_dir, "state.json"))
+        self.assertTrue(new_state_manager.is_torrent_evicted("hash3"))
+        self.assertTrue(new_state_manager.is_torrent_id_evicted("102"))
+
+    @patch("main.get_local_torrent_hash")
+    @patch("main.is_torrent_in_transmission")
+    @patch("main.download_torrent")
+    def test_process_evicted_torrent(self, mock_download, mock_is_in, mock_hash):
+        # 测试已淘汰的种子在下载前跳过，本地种子文件只计算一次哈希
+        mock_is_in.return_value = False
+        self.state_manager.add_added_torrent(1, "hash1")
+        self.state_manager.add_evicted_torrent("hash1")
+        self.assertFalse(process_single_torrent({"id": 1, "title": "Evicted"}, 0, self.state_manager))
+        mock_hash.assert_not_called()
+
+        # 只有哈希的旧淘汰记录通过本地种子文件判断
+        self.state_manager.add_evicted_torrent("hash2")
+        mock_hash.return_value = "HASH2"
+        self.assertFalse(process_single_torrent({"id": 2, "title": "Legacy Evicted"}, 0, self.state_manager))
+        mock_hash.assert_called_once_with(2)
+        mock_is_in.assert_called_once_with(2, "HASH2")
+        mock_download.assert_not_called()
+        self.assertTrue(self.state_manager.is_torrent_processed(1))
+        self.assertTrue(self.state_manager.is_torrent_processed(2))
+
+    def test_seeding_pool_eviction_lru_size_budget(self):
+        # 测试超出体积上限时按最近活动时间淘汰
+        client = MagicMock()
+        client.get_torrents.return_value = [
+            self.make_seeding_torrent(1, ratio=0.0, seeders=100, idle_days=1, size=60),
+            self.make_seeding_torrent(2, ratio=9.0, seeders=1, idle_days=10, size=30),
+            self.make_seeding_torrent(3, ratio=1.0, seeders=5, idle_days=3, size=30),
+        ]
+        evictor = SeedingPoolEvictor(lambda: client, ["MTeam官种"], max_total_size=100, policy="lru")
+        self.assertEqual(evictor.evict(self.state_manager), ["hash2"])
+
+        # 未设置上限时不淘汰
+        self.assertEqual(SeedingPoolEvictor(lambda: client, ["MTeam官种"]).evict(self.state_manager), [])
+
+    @patch("main.process_admitted_torrent", return_value=True)
+    @patch("main.update_transmission_cache")
+    @patch("main.init_transmission_client")
+    def test_run_evicts_when_disk_full(self, mock_init, mock_update, mock_process):
+        # 测试磁盘空间不足时先淘汰做种池释放空间，空间足够后继续处理本页剩余的种子
+        client = MagicMock()
+        client.free_space.return_value = 100
+        client.get_torrents.return_value = []
+        admission = AdmissionController(lambda: client, "/downloads", reserve=0)
+        evictor = MagicMock(enabled=True, delete_data=True)
+
+        def evict(state_manager):
+            if admission.paused:
+                client.free_space.return_value = 200
+                return ["hash1"]
+            return []
+        evictor.evict.side_effect = evict
+
+        stream = MagicMock(key="team:1|category:")
+        fanout = MagicMock()
+        fanout.pages.return_value = iter([(stream, 1, [{"id": 1, "title": "A", "size": 80},
+                                                       {"id": 2, "title": "B", "size": 80}])])
+        with patch("main.StateManager", return_value=self.state_manager), \
+                patch("main.AdmissionController", return_value=admission), \
+                patch("main.SeedingPoolEvictor", return_value=evictor), \
+                patch("main.build_query_streams", return_value=[stream]), \
+                patch("main.QueryFanOut", return_value=fanout):
+            from main import run
+            run()
+
+        self.assertEqual([c.args[0]["id"] for c in mock_process.call_args_list], [1, 2])
+        self.assertFalse(admission.paused)
+        self.assertEqual(self.state_manager.get_query_page(stream.key), 1)
+
+    def test_seeding_pool_eviction_refresh_interval(self):
+        # 测试统计索引按间隔重建，期间根据新添加和已淘汰的种子更新
+        client = MagicMock()
+        client.get_torrents.return_value = [
+            self.make_seeding_torrent(1, ratio=5.0, seeders=2, idle_days=0, size=10),
+            self.make_seeding_torrent(2, ratio=0.1, seeders=80, idle_days=20, size=10),
+            self.make_seeding_torrent(3, ratio=0.5, seeders=40, idle_days=5, size=10),
+        ]
+        evictor = SeedingPoolEvictor(lambda: client, ["MTeam官种"], max_count=3, refresh_interval=600)
+        self.assertEqual(evictor.evict(self.state_manager), [])
+        self.assertEqual(client.get_torrents.call_count, 1)
+
+        # 新添加的种子使做种池超出上限，不重新获取统计即可淘汰
+        evictor.note_added(10)
+        self.assertEqual(evictor.evict(self.state_manager), ["hash2"])
+        self.assertEqual(evictor.evict(self.state_manager), [])
+        self.assertEqual(client.get_torrents.call_count, 1)
+        self.assertEqual(len(evictor.index), 3)
+
+        # 超过间隔后重新获取统计，新添加的种子以实际统计为准
+        evictor.index.last_refresh -= 601
+        evictor.evict(self.state_manager)
+        self.assertEqual(client.get_torrents.call_count, 2)
+        self.assertEqual(evictor.index.pending_count, 0)
+
+    def test_status_command(self):
+        # 测试没有查询流检查点时显示旧版全局页码
+        import io
+        import contextlib
+        self.state_manager.update_last_page(5)
+        output = io.StringIO()
+        with patch("main.StateManager", return_value=self.state_manager), contextlib.redirect_stdout(output):
+            status_command(None)
+        self.assertIn("最后处理页码: 5", output.getvalue())
+
+        self.state_manager.update_query_page("team:44|category:", 7)
+        output = io.StringIO()
+        with patch("main.StateManager", return_value=self.state_manager), contextlib.redirect_stdout(output):
+            status_command(None)
+        self.assertIn("查询 team:44|category: 最后处理页码: 7", output.getvalue())
+        self.assertNotIn("最后处理页码: 5", output.getvalue())
+
+    def test_build_query_streams(self):
+        # 测试每个制作组/分类组合有独立检查点，新增制作组从第1页开始
+        self.state_manager.update_query_page("team:44|category:", 7)
+        streams = build_query_streams(["44", "9"], [""], self.state_manager)
+        self.assertEqual([(s.key, s.start_page) for s in streams],
+                         [("team:44|category:", 7), ("team:9|category:", 1)])
+        self.assertEqual(streams[1].teams, ["9"])
+
+        # 只有一个查询流时沿用旧的全局页码
+        self.state_manager.update_last_page(5)
+        streams = build_query_streams(["43"], [""], self.state_manager)
+        self.assertEqual(streams[0].start_page, 5)
+
+    def test_query_fanout(self):
+        # 测试多个查询流并发获取、合并去重，慢的查询流不阻塞其他流
+        import threading
+        slow_release = threading.Event()
+        pages = {
+            ("fast", 1): [{"id": 1}, {"id": 2}, {"id": 5}],
+            ("fast", 2): [{"id": 3}],
+            ("slow", 4): [{"id": 2}, {"id": 4}],
+        }
+        fetched = []
+
+        def fetch_page(stream, page_number):
+            if stream.team == "slow":
+                slow_release.wait(5)
+            fetched.append((stream.team, page_number))
+            torrents = pages[(stream.team, page_number)]
+            # 每页3条，不足3条表示最后一页
+            return torrents, len(torrents)
+
+        self.state_manager.update_query_page("team:slow|category:", 4)
+        streams = build_query_streams(["fast", "slow"], [""], self.state_manager)
+        fanout = QueryFanOut(streams, fetch_page, page_size=3, queue_size=4)
+        fanout.start()
+        results = []
+        for stream, page_number, torrents in fanout.pages():
+            results.append((stream.team, page_number, [t["id"] for t in torrents]))
+            if stream.team == "fast" and page_number == 2:
+                slow_release.set()
+        fanout.stop()
+
+        self.assertEqual(results, [("fast", 1, [1, 2, 5]), ("fast", 2, [3]), ("slow", 4, [4])])
+        self.assertNotIn(("slow", 1), fetched)
+
+    def test_query_fanout_request_interval(self):
+        # 测试所有查询流共享请求间隔，并发的查询流不会同时发出请求
+        import time
+        import threading
+        started = []
+        lock = threading.Lock()
+
+        def fetch_page(stream, page_number):
+            with lock:
+                started.append(time.monotonic())
+            return [], 0
+
+        streams = build_query_streams(["a", "b", "c"], [""], self.state_manager)
+        fanout = QueryFanOut(streams, fetch_page, page_size=3, max_concurrent_requests=3, request_interval=0.1)
+        fanout.start()
+        self.assertEqual(len(list(fanout.pages())), 3)
+        started.sort()
+        self.assertEqual(len(started), 3)
+        for previous, current in zip(started, started[1:]):
+            self.assertGreaterEqual(current - previous, 0.09)
+
+    @patch("main.time.sleep")
+    @patch("requests.post")
+    def test_search_rate_limited(self, mock_post, mock_sleep):
+        # 测试搜索请求过于频繁时按退避时间重试
+        throttled = MagicMock(ok=True)
+        throttled.json.return_value = {"code": "1", "message": "請求過於頻繁"}
+        success = MagicMock(ok=True)
+        success.json.return_value = {"code": "0", "data": {"data": [
+            {"id": 1, "name": "Test", "size": "100", "status": {"seeders": "20"}}]}}
+        self.config_data["download"].update(max_size=1000, min_size=1, initial_retry_delay=5)
+        set_config(Config(self.config_data))
+        mock_post.side_effect = [throttled, throttled, success]
+        torrents = get_mteam_torrents(1)
+        self.assertEqual([t["id"] for t in torrents], [1])
+        self.assertEqual([c.args[0] for c in mock_sleep.call_args_list], [5, 10])
+
+        # 超过最大重试次数后抛出APIError
+        mock_post.side_effect = None
+        mock_post.return_value = throttled
+        with self.assertRaises(APIError):
+            get_mteam_torrents(1)
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file